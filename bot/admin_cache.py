@@ -0,0 +1,74 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADMIN_CHANNEL = "admin_updates"
+
+class AdminCache:
+    """
+    Множество id администраторов в памяти процесса.
+    Загружается из таблицы users один раз, обновляется при изменении прав
+    и синхронизируется между процессами бота через Redis pub/sub.
+    """
+
+    def __init__(self):
+        self.redis = None
+        self._admins = set()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        from bot.database import get_admin_ids
+        admins = await get_admin_ids()
+        self._admins = set(admins)
+        self._loaded = True
+        logger.info(f"Admin cache loaded: {len(self._admins)} admins.")
+
+    async def is_admin(self, user_id):
+        if not self._loaded:
+            async with self._lock:
+                if not self._loaded:
+                    await self.load()
+        return user_id in self._admins
+
+    def _apply(self, user_id, is_admin):
+        if is_admin:
+            self._admins.add(user_id)
+        else:
+            self._admins.discard(user_id)
+
+    async def set(self, user_id, is_admin):
+        self._apply(user_id, is_admin)
+        if self.redis is not None:
+            try:
+                await self.redis.publish(ADMIN_CHANNEL, f"{user_id}:{int(is_admin)}")
+            except Exception as e:
+                logger.error(f"Error publishing admin update: {e}")
+
+    async def listen(self):
+        """
+        Получает изменения прав от других процессов.
+        После каждого (пере)подключения кэш перечитывается из базы,
+        чтобы не пропустить изменения, сделанные за время разрыва.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(ADMIN_CHANNEL)
+                    await self.load()
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        data = message['data']
+                        if isinstance(data, bytes):
+                            data = data.decode()
+                        user_id, is_admin = data.split(":")
+                        self._apply(int(user_id), is_admin == "1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Admin cache listener error: {e}")
+                await asyncio.sleep(5)
+
+admin_cache = AdminCache()
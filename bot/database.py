@@ -1,8 +1,30 @@
-import asyncpg
+import asyncio
 import logging
+import time
 from dotenv import load_dotenv
 import os
 from datetime import datetime, timezone, timedelta
+from bot.scheduler import hold_scheduler
+from bot.user_cache import user_cache
+from bot.admin_cache import admin_cache
+from bot.page_cache import page_cache
+from bot.db_pool import create_pool, connect_for_schema
+from bot.outbox import outbox
+from bot.status import Status
+from bot.metrics import retention_rows, retention_lag
+from bot.partitions import NUMBERS_PARTITIONED, partition_numbers, is_partitioned, ensure_partitions, drop_expired_partitions
+from bot.migrate import migrate, schema_lock
+from bot.query_plans import check_query_plans
+from bot.queries import (
+    ALL_RECORDS_FIRST, ALL_RECORDS_AFTER, ALL_RECORDS_BEFORE, LIST_BY_STATUS_FIRST,
+    LIST_BY_STATUS_AFTER, LIST_BY_STATUS_BEFORE, FIND_BY_NUMBER, USER_NUMBERS,
+    USER_NUMBERS_BY_STATUS, COUNT_BY_USER, COUNT_BY_USER_STATUS, COUNTS_BY_USER, ADD_WAITING,
+    ADD_WAITING_PARTITIONED, CREATE_INTAKE, ADD_MANY_WAITING, ADD_MANY_WAITING_PARTITIONED,
+    MOVE_TO_HOLD, MOVE_MANY_TO_HOLD, MARK_SUCCESSFUL, MARK_MANY_SUCCESSFUL, MARK_FAILED,
+    MARK_MANY_FAILED, EXPIRE_HOLDS, HOLD_DEADLINES, DELETE_NUMBER, CLEAR_NUMBERS,
+    DELETE_EXPIRED_BATCH, ARCHIVE_EXPIRED_BATCH, OLDEST_EXPIRED, CLEAR_COUNTERS,
+    REBUILD_COUNTERS, ADMIN_EXISTS, SET_USER_ADMIN, ADMIN_IDS, SAVE_USER_NAMES, USER_NAMES
+)
 
 load_dotenv()
 
@@ -12,43 +34,41 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 
+RETENTION_PERIOD = timedelta(days=1)
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 1000))
+RETENTION_PAUSE = float(os.getenv("RETENTION_PAUSE", 0.2))
+RETENTION_MAX_RUNTIME = float(os.getenv("RETENTION_MAX_RUNTIME", 300))
+RETENTION_ARCHIVE = os.getenv("RETENTION_ARCHIVE", "false").lower() in ("1", "true", "yes")
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 _pool = None
+# Выставляется в init_db: numbers секционирована по суткам (см. bot/partitions.py)
+_numbers_partitioned = False
+
+# Строки счетчиков с этим user_id хранят итоги по всем пользователям
+ALL_USERS = 0
 
 async def init_db():
     """
-    Инициализирует базу данных, создает таблицы и добавляет первого админа.
+    Приводит схему к актуальной версии миграций и добавляет первого админа.
     """
+    global _numbers_partitioned
     try:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
-            # Создаем таблицы, если они еще не существуют
-            await conn.execute(""" 
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    is_admin BOOLEAN NOT NULL DEFAULT FALSE
-                )
-            """)
-            await conn.execute(""" 
-                CREATE TABLE IF NOT EXISTS numbers (
-                    id SERIAL PRIMARY KEY,
-                    number TEXT NOT NULL,
-                    user_id BIGINT NOT NULL,
-                    status TEXT NOT NULL,
-                    timestamp TIMESTAMPTZ NOT NULL,
-                    hold_start TIMESTAMPTZ,
-                    hold_end TIMESTAMPTZ,
-                    hold_duration INTERVAL,
-                    hold_time INTERVAL,
-                    hold_set_by BIGINT REFERENCES users(user_id),
-                    chat_id BIGINT
-                )
-            """)
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON numbers (status)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON numbers (timestamp)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_number ON numbers (number)")
+        # Миграции идут через отдельное соединение без таймаута команд (см. connect_for_schema)
+        conn = await connect_for_schema(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+        try:
+            await migrate(conn)
+            _numbers_partitioned = await is_partitioned(conn)
+            if NUMBERS_PARTITIONED or _numbers_partitioned:
+                async with schema_lock(conn):
+                    if not _numbers_partitioned:
+                        await partition_numbers(conn)
+                        _numbers_partitioned = True
+                    await ensure_partitions(conn)
+        finally:
+            await conn.close()
         
         # Добавляем первого админа
         await add_first_admin()
@@ -58,13 +78,28 @@ async def init_db():
         logger.error(f"Error initializing database: {e}")
         raise
 
+async def rebuild_counters(conn=None):
+    """
+    Пересчитывает таблицу счетчиков с нуля по текущему содержимому numbers.
+    """
+    if conn is None:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            return await rebuild_counters(conn)
+    async with conn.transaction():
+        # Блокируем запись в numbers, чтобы счетчики не разошлись во время пересчета
+        await conn.execute("LOCK TABLE numbers IN SHARE MODE")
+        await conn.execute(CLEAR_COUNTERS)
+        await conn.execute(REBUILD_COUNTERS, ALL_USERS)
+    logger.info("Number counters rebuilt.")
+
 # database.py
 async def get_pool():
     global _pool
     if _pool is None:
         try:
             logger.info(f"Creating PostgreSQL connection pool with host={DB_HOST}, port={DB_PORT}, user={DB_USER}, database={DB_NAME}")
-            _pool = await asyncpg.create_pool(
+            _pool = await create_pool(
                 host=DB_HOST,
                 port=DB_PORT,
                 user=DB_USER,
@@ -77,6 +112,21 @@ async def get_pool():
             raise RuntimeError("Failed to create database connection pool") from e
     return _pool
 
+async def get_pool_stats():
+    """
+    Текущее состояние пула соединений: занятые, свободные, ожидание соединения.
+    """
+    pool = await get_pool()
+    return pool.stats()
+
+async def get_query_plans():
+    """
+    Проверяет по EXPLAIN, что горячие запросы читают таблицы через индексы.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        return await check_query_plans(conn, _numbers_partitioned)
+
 async def add_first_admin():
     """
     Добавляет первого админа в таблицу users, если его еще нет.
@@ -85,19 +135,11 @@ async def add_first_admin():
         pool = await get_pool()
         async with pool.acquire() as conn:
             # Проверяем, есть ли уже админ в таблице
-            admin_exists = await conn.fetchval("""
-                SELECT EXISTS (
-                    SELECT 1 FROM users WHERE is_admin = TRUE
-                )
-            """)
+            admin_exists = await conn.fetchval(ADMIN_EXISTS)
             
             if not admin_exists:
                 first_admin_id = 7699005037
-                await conn.execute("""
-                    INSERT INTO users (user_id, is_admin)
-                    VALUES ($1, $2)
-                    ON CONFLICT (user_id) DO UPDATE SET is_admin = $2
-                """, first_admin_id, True)
+                await conn.execute(SET_USER_ADMIN, first_admin_id, True)
                 logger.info(f"First admin with user_id={first_admin_id} added.")
             else:
                 logger.info("Admin already exists in the database.")
@@ -105,203 +147,327 @@ async def add_first_admin():
         logger.error(f"Error adding first admin: {e}")
         raise
 
-async def delete_expired_records():
+async def delete_expired_batch(conn, expiration_time, limit, archive=False):
+    """
+    Удаляет (и при archive переносит в numbers_archive) не больше limit
+    просроченных записей. Возвращает количество удаленных строк.
+    """
+    if archive:
+        # Считаем удаленные строки: из-за ON CONFLICT DO NOTHING вставленных может быть меньше
+        return await conn.fetchval(ARCHIVE_EXPIRED_BATCH, expiration_time, limit)
+    result = await conn.execute(DELETE_EXPIRED_BATCH, expiration_time, limit)
+    return int(result.split()[-1])
+
+async def delete_expired_records(batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_PAUSE,
+                                 max_runtime=RETENTION_MAX_RUNTIME, archive=RETENTION_ARCHIVE):
+    """
+    Удаляет записи старше суток небольшими пачками с паузами между ними,
+    чтобы не держать долгие блокировки и не раздувать WAL одним запросом.
+    Возвращает статистику: удалено строк, строк в секунду и отставание
+    (возраст самой старой просроченной записи, оставшейся в таблице;
+    None, если прогон прервался ошибкой).
+    """
     pool = await get_pool()
+    expiration_time = datetime.now(timezone.utc) - RETENTION_PERIOD
+    started = time.monotonic()
+    deleted = 0
+    lag = None
     try:
+        if _numbers_partitioned:
+            # Целиком просроченные секции удаляются без построчного DELETE;
+            # schema_lock может быть занят миграцией, поэтому соединение без таймаута
+            conn = await connect_for_schema(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+            try:
+                async with schema_lock(conn):
+                    dropped = await drop_expired_partitions(conn, expiration_time, archive)
+                    await ensure_partitions(conn)
+            finally:
+                await conn.close()
+            deleted += dropped
+            retention_rows.inc(amount=dropped)
+        while True:
+            async with pool.acquire() as conn:
+                batch = await delete_expired_batch(conn, expiration_time, batch_size, archive)
+            deleted += batch
+            retention_rows.inc(amount=batch)
+            if batch < batch_size or time.monotonic() - started >= max_runtime:
+                break
+            await asyncio.sleep(pause)
         async with pool.acquire() as conn:
-            expiration_time = datetime.now(timezone.utc) - timedelta(days=1)
-            await conn.execute(""" 
-                DELETE FROM numbers WHERE timestamp < $1
-            """, expiration_time)
-            logger.info("Expired records deleted.")
+            oldest = await conn.fetchval(OLDEST_EXPIRED, expiration_time)
+        lag = (expiration_time - oldest).total_seconds() if oldest else 0
+        retention_lag.set(lag)
     except Exception as e:
+        # Отставание неизвестно: метрика сохраняет последнее измеренное значение
         logger.error(f"Error deleting records: {e}")
+    elapsed = time.monotonic() - started
+    stats = {
+        'deleted': deleted,
+        'rows_per_second': deleted / elapsed if elapsed else 0,
+        'lag_seconds': lag,
+    }
+    if deleted:
+        await page_cache.invalidate()
+    lag_text = "unknown" if lag is None else f"{lag:.0f}s"
+    logger.info(f"Expired records deleted: {deleted} ({stats['rows_per_second']:.0f} rows/s), lag {lag_text}.")
+    return stats
 
-async def get_all_records(limit=10, last_id=None):
+async def get_all_records(limit=10, last_id=None, before_id=None):
+    """
+    Возвращает страницу всех номеров, упорядоченную по id.
+    last_id — страница после этой записи, before_id — страница перед ней.
+    """
     pool = await get_pool()
     async with pool.acquire() as conn:
         if last_id:
-            records = await conn.fetch("""
-                SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration 
-                FROM numbers 
-                WHERE id > $1 
-                ORDER BY id 
-                LIMIT $2
-            """, last_id, limit)
+            records = await conn.fetch(ALL_RECORDS_AFTER, last_id, limit)
+        elif before_id:
+            records = await conn.fetch(ALL_RECORDS_BEFORE, before_id, limit)
+            records = list(reversed(records))
         else:
-            records = await conn.fetch("""
-                SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration 
-                FROM numbers 
-                ORDER BY id 
-                LIMIT $2
-            """, limit)
-    return [dict(record) for record in records]
+            records = await conn.fetch(ALL_RECORDS_FIRST, limit)
+    return add_elapsed_time([dict(record) for record in records])
+
+def add_elapsed_time(records):
+    now = datetime.now(timezone.utc)
+    for record in records:
+        if record.get('hold_start') and record.get('hold_duration'):
+            record['elapsed_time'] = now - record['hold_start']
+        else:
+            record['elapsed_time'] = None
+    return records
 
 async def count_records(user_id=None, status=None):
     pool = await get_pool()
     async with pool.acquire() as conn:
-        query = "SELECT COUNT(*) FROM numbers"
-        args = []
-        if user_id and status:
-            query += " WHERE user_id = $1 AND status = $2"
-            args = [user_id, status]
-        elif user_id:
-            query += " WHERE user_id = $1"
-            args = [user_id]
-        elif status:
-            query += " WHERE status = $1"
-            args = [status]
-        count = await conn.fetchval(query, *args)
+        if status:
+            count = await conn.fetchval(COUNT_BY_USER_STATUS, user_id or ALL_USERS, status)
+        else:
+            count = await conn.fetchval(COUNT_BY_USER, user_id or ALL_USERS)
     return count if count else 0
 
+async def count_by_status(user_id=None):
+    """
+    Возвращает количество номеров по каждому статусу одним запросом.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(COUNTS_BY_USER, user_id or ALL_USERS)
+    counts = dict.fromkeys(Status, 0)
+    counts.update({Status(record['status']): record['count'] for record in records})
+    return counts
+
 async def find_record_by_number(number):
     pool = await get_pool()
     async with pool.acquire() as conn:
-        record = await conn.fetchrow(""" 
-            SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration 
-            FROM numbers 
-            WHERE number = $1 
-        """, number)
+        record = await conn.fetchrow(FIND_BY_NUMBER, number)
     return dict(record) if record else None
 
 async def add_to_waiting(user_id, number, chat_id):
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            existing = await conn.fetchval(""" 
-                SELECT EXISTS(SELECT 1 FROM numbers WHERE number = $1) 
-            """, number)
-            if existing:
-                return f"Номер {number} уже существует."
-            await conn.execute(""" 
-                INSERT INTO numbers (number, user_id, status, timestamp, chat_id) 
-                VALUES ($1, $2, $3, $4, $5) 
-            """, number, user_id, "🔵 Ожидание", datetime.now(timezone.utc), chat_id)
+            if _numbers_partitioned:
+                added = await conn.fetchval(ADD_WAITING_PARTITIONED, number, user_id, Status.WAITING, datetime.now(timezone.utc), chat_id)
+            else:
+                added = await conn.fetchval(ADD_WAITING, number, user_id, Status.WAITING, datetime.now(timezone.utc), chat_id)
+        if added is None:
+            return f"Номер {number} уже существует."
+        await page_cache.invalidate(Status.WAITING)
         return f"Номер {number} добавлен в список ожидания."
     except Exception as e:
         logger.error(f"Error adding to waiting list: {e}")
         return f"Произошла ошибка: {e}"
 
-async def get_list_by_status(status, limit=10, offset=0):
+async def add_many_to_waiting(user_id, numbers, chat_id):
+    """
+    Добавляет пачку номеров в ожидание: COPY во временную таблицу
+    и один INSERT ... ON CONFLICT. Возвращает количество добавленных номеров.
+    """
+    if not numbers:
+        return 0
     pool = await get_pool()
     async with pool.acquire() as conn:
-        records = await conn.fetch("""
-            SELECT id, number, user_id, status, timestamp, hold_start, hold_duration 
-            FROM numbers 
-            WHERE status = $1 
-            ORDER BY timestamp ASC 
-            LIMIT $2 OFFSET $3 
-        """, status, limit, offset)
-    records_dict = [dict(record) for record in records]
-    for record in records_dict:
-        if record.get('hold_start') and record.get('hold_duration'):
-            elapsed = datetime.now(timezone.utc) - record['hold_start']
-            record['elapsed_time'] = elapsed
+        async with conn.transaction():
+            await conn.execute(CREATE_INTAKE)
+            await conn.copy_records_to_table("numbers_intake", records=[(number,) for number in numbers])
+            if _numbers_partitioned:
+                added = await conn.fetchval(ADD_MANY_WAITING_PARTITIONED, user_id, Status.WAITING, datetime.now(timezone.utc), chat_id)
+            else:
+                added = await conn.fetchval(ADD_MANY_WAITING, user_id, Status.WAITING, datetime.now(timezone.utc), chat_id)
+    if added:
+        await page_cache.invalidate(Status.WAITING)
+    return added
+
+async def get_list_by_status(status, limit=10, after=None, before=None):
+    """
+    Возвращает страницу номеров со статусом status, упорядоченную по (timestamp, id).
+    after/before — ключ (timestamp, id) записи, после или до которой начинается страница.
+    """
+    status = Status(status)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        if after:
+            records = await conn.fetch(LIST_BY_STATUS_AFTER[status], after[0], after[1], limit)
+        elif before:
+            records = await conn.fetch(LIST_BY_STATUS_BEFORE[status], before[0], before[1], limit)
+            records = list(reversed(records))
         else:
-            record['elapsed_time'] = None
-    return records_dict
+            records = await conn.fetch(LIST_BY_STATUS_FIRST[status], limit)
+    return add_elapsed_time([dict(record) for record in records])
 
 async def move_to_hold(number, hold_duration=None, hold_set_by=None, chat_id=None):
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            hold_start = datetime.now(timezone.utc)
-            if hold_duration:
-                hold_end = hold_start + hold_duration
-            else:
-                hold_end = None
-            await conn.execute(""" 
-                UPDATE numbers 
-                SET status = $2, hold_start = $3, hold_end = $4, hold_duration = $5, hold_set_by = $6, chat_id = $7 
-                WHERE number = $1 AND status = $8 
-            """, number, "🟠 Холдинг", hold_start, hold_end, hold_duration, hold_set_by, chat_id, "🔵 Ожидание")
+            # Время начала и конца холда считает сервер; RETURNING показывает, изменилась ли строка
+            record = await conn.fetchrow(MOVE_TO_HOLD, number, Status.HOLD, hold_duration, hold_set_by, chat_id, Status.WAITING)
+        if not record:
+            return f"Номер {number} не найден в списке ожидания."
+        if record['hold_end']:
+            hold_scheduler.schedule(number, record['hold_end'])
+        await page_cache.invalidate(Status.WAITING, Status.HOLD)
         return f"Номер {number} взят в холд."
     except Exception as e:
         logger.error(f"Error moving to hold: {e}")
         return f"Произошла ошибка: {e}"
 
+async def move_many_to_hold(numbers, hold_duration=None, hold_set_by=None, chat_id=None):
+    """
+    Берет в холд сразу несколько номеров. Возвращает список взятых номеров.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(MOVE_MANY_TO_HOLD, numbers, Status.HOLD, hold_duration, hold_set_by, chat_id, Status.WAITING)
+    for record in records:
+        if record['hold_end']:
+            hold_scheduler.schedule(record['number'], record['hold_end'])
+    if records:
+        await page_cache.invalidate(Status.WAITING, Status.HOLD)
+    return [record['number'] for record in records]
+
+async def mark_many_as_successful(numbers, chat_id, bot):
+    """
+    Завершает холд сразу нескольких номеров. Возвращает список завершенных номеров.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(MARK_MANY_SUCCESSFUL, numbers, Status.SUCCESS, Status.HOLD)
+    records = [dict(record) for record in records]
+    for record in records:
+        hold_scheduler.cancel(record['number'])
+        record['chat_id'] = chat_id or record['chat_id']
+    if records:
+        await page_cache.invalidate(Status.HOLD, Status.SUCCESS)
+        await notify_successful_holds(records, bot)
+    return [record['number'] for record in records]
+
+async def mark_many_as_failed(numbers):
+    """
+    Помечает слетевшими сразу несколько номеров. Возвращает список измененных номеров.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(MARK_MANY_FAILED, numbers, Status.FAILED, Status.HOLD)
+    for record in records:
+        hold_scheduler.cancel(record['number'])
+    if records:
+        await page_cache.invalidate(Status.HOLD, Status.FAILED)
+    return [record['number'] for record in records]
+
 async def mark_as_successful(number, chat_id, bot):
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            # Fetch user_id and hold_set_by before updating
-            record = await conn.fetchrow("""
-                SELECT user_id, hold_set_by, hold_start
-                FROM numbers
-                WHERE number = $1 AND status = $2
-            """, number, "🟠 Холдинг")
-            if not record:
-                return "Номер не найден в холде."
-            
-            user_id = record['user_id']
-            hold_set_by = record['hold_set_by']
-            hold_start = record['hold_start']
-            
-            if hold_start:
-                elapsed_time = datetime.now(timezone.utc) - hold_start
-                await conn.execute(""" 
-                    UPDATE numbers 
-                    SET status = $2, hold_end = $3, hold_time = $4 
-                    WHERE number = $1 AND status = $5 
-                """, number, "🟢 Успешно", datetime.now(timezone.utc), elapsed_time, "🟠 Холдинг")
-            else:
-                await conn.execute(""" 
-                    UPDATE numbers 
-                    SET status = $2, hold_end = $3 
-                    WHERE number = $1 AND status = $4 
-                """, number, "🟢 Успешно", datetime.now(timezone.utc), "🟠 Холдинг")
+            record = await conn.fetchrow(MARK_SUCCESSFUL, number, Status.SUCCESS, Status.HOLD)
+        if not record:
+            return "Номер не найден в холде."
+        hold_scheduler.cancel(number)
+        await page_cache.invalidate(Status.HOLD, Status.SUCCESS)
         
-        # Fetch user information
-        try:
-            worker_user = await bot.get_chat(user_id)
-            worker_tag = f"<a href='tg://user?id={worker_user.id}'>{worker_user.full_name}</a>"
-        except:
-            worker_tag = "Пользователь не найден"
+        await notify_successful_holds([{
+            'number': number,
+            'user_id': record['user_id'],
+            'hold_set_by': record['hold_set_by'],
+            'chat_id': chat_id or record['chat_id'],
+            'hold_time': record['hold_time'],
+        }], bot)
         
-        if hold_set_by:
-            try:
-                admin_user = await bot.get_chat(hold_set_by)
-                admin_tag = f"<a href='tg://user?id={admin_user.id}'>{admin_user.full_name}</a>"
-            except:
-                admin_tag = "Пользователь не найден"
+        return f"Номер {number} успешно завершил холд."
+    except Exception as e:
+        logger.error(f"Error marking as successful: {e}")
+        return f"Произошла ошибка: {e}"
+
+async def expire_holds(now=None):
+    """
+    Переводит все номера с истекшим холдом в статус успешных одним запросом.
+    Возвращает список переведенных записей для отправки уведомлений.
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(EXPIRE_HOLDS, now, Status.SUCCESS)
+    for record in records:
+        hold_scheduler.cancel(record['number'])
+    if records:
+        await page_cache.invalidate(Status.HOLD, Status.SUCCESS)
+    return [dict(record) for record in records]
+
+async def get_hold_deadlines():
+    """
+    Возвращает дедлайны всех номеров в холде с ограниченной длительностью.
+    Используется для восстановления расписания при запуске.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(HOLD_DEADLINES)
+    return [dict(record) for record in records]
+
+async def notify_successful_holds(records, bot):
+    """
+    Ставит в очередь отправки уведомления об успешно отстоявших холд номерах.
+    Теги пользователей запрашиваются один раз на каждого пользователя в пачке.
+    """
+    user_ids = []
+    for record in records:
+        user_ids.append(record['user_id'])
+        if record.get('hold_set_by'):
+            user_ids.append(record['hold_set_by'])
+    tags = await user_cache.get_tags(bot, user_ids)
+
+    messages = []
+    for record in records:
+        if not record.get('chat_id'):
+            continue
+        worker_tag = tags[record['user_id']]
+        if record.get('hold_set_by'):
+            admin_tag = tags[record['hold_set_by']]
         else:
             admin_tag = "Не указан"
-        
-        # Prepare the message
-        elapsed_str = f"{elapsed_time.days}d {elapsed_time.seconds // 3600}h {(elapsed_time.seconds % 3600) // 60}m"
+        elapsed_time = record.get('hold_time')
+        if elapsed_time:
+            elapsed_str = f"{elapsed_time.days}d {elapsed_time.seconds // 3600}h {(elapsed_time.seconds % 3600) // 60}m"
+        else:
+            elapsed_str = "0d 0h 0m"
         message_text = (
-            f"Номер {number} успешно отстоял холд!\n"
+            f"Номер {record['number']} успешно отстоял холд!\n"
             f"Залил: {worker_tag}\n"
             f"Поставил: {admin_tag}\n"
             f"Отстоял: {elapsed_str}"
         )
-        
-        # Send the message to the specified chat
-        await bot.send_message(chat_id=chat_id, text=message_text, parse_mode="HTML")
-        
-        return f"Номер {number} успешно завершил холд."
-    except Exception as e:
-        logger.error(f"Error marking as successful: {e}")
-        return f"Произошла ошибка: {e}"
+        messages.append((record['chat_id'], message_text, "HTML", "Холды завершены"))
+    await outbox.send(bot, messages)
 
 async def mark_as_failed(number):
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            hold_start = await conn.fetchval("SELECT hold_start FROM numbers WHERE number = $1", number)
-            if hold_start:
-                elapsed_time = datetime.now(timezone.utc) - hold_start
-                await conn.execute("""
-                    UPDATE numbers 
-                    SET status = $2, hold_time = $3 
-                    WHERE number = $1 AND status = $4
-                """, number, "🔴 Слетел", elapsed_time, "🟠 Холдинг")
-            else:
-                await conn.execute("""
-                    UPDATE numbers 
-                    SET status = $2 
-                    WHERE number = $1 AND status = $3
-                """, number, "🔴 Слетел", "🟠 Холдинг")
+            record = await conn.fetchrow(MARK_FAILED, number, Status.FAILED, Status.HOLD)
+        if not record:
+            return "Номер не найден в холде."
+        hold_scheduler.cancel(number)
+        await page_cache.invalidate(Status.HOLD, Status.FAILED)
         return f"Номер {number} помечен как слетевший."
     except Exception as e:
         logger.error(f"Error marking as failed: {e}")
@@ -311,7 +477,9 @@ async def clear_all():
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            await conn.execute("DELETE FROM numbers")
+            await conn.execute(CLEAR_NUMBERS)
+        hold_scheduler.clear()
+        await page_cache.invalidate()
         return "Все списки очищены."
     except Exception as e:
         logger.error(f"Error clearing all records: {e}")
@@ -320,44 +488,52 @@ async def clear_all():
 async def set_user_admin(user_id, is_admin=True):
     pool = await get_pool()
     async with pool.acquire() as conn:
-        await conn.execute(""" 
-            INSERT INTO users (user_id, is_admin) 
-            VALUES ($1, $2) 
-            ON CONFLICT (user_id) DO UPDATE SET is_admin = $2 
-        """, user_id, is_admin)
+        await conn.execute(SET_USER_ADMIN, user_id, is_admin)
+    await admin_cache.set(user_id, is_admin)
 
 async def is_admin(user_id):
+    return await admin_cache.is_admin(user_id)
+
+async def get_admin_ids():
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        records = await conn.fetch(ADMIN_IDS)
+    return [record['user_id'] for record in records]
+
+async def save_user_names(names):
+    """
+    Сохраняет имена пользователей пачкой. names — словарь {user_id: full_name}.
+    """
+    if not names:
+        return
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(SAVE_USER_NAMES, list(names.keys()), list(names.values()))
+
+async def get_user_names(user_ids):
     pool = await get_pool()
     async with pool.acquire() as conn:
-        is_admin = await conn.fetchval(""" 
-            SELECT is_admin FROM users WHERE user_id = $1 
-        """, user_id)
-    return is_admin if is_admin is not None else False
+        records = await conn.fetch(USER_NAMES, list(user_ids))
+    return {record['user_id']: record['full_name'] for record in records}
 
 async def get_user_numbers(user_id, status=None):
     pool = await get_pool()
     async with pool.acquire() as conn:
         if status:
-            records = await conn.fetch(""" 
-                SELECT id, number, status, timestamp, hold_start, hold_end, hold_duration 
-                FROM numbers 
-                WHERE user_id = $1 AND status = $2 
-            """, user_id, status)
+            records = await conn.fetch(USER_NUMBERS_BY_STATUS, user_id, status)
         else:
-            records = await conn.fetch(""" 
-                SELECT id, number, status, timestamp, hold_start, hold_end, hold_duration 
-                FROM numbers 
-                WHERE user_id = $1 
-            """, user_id)
+            records = await conn.fetch(USER_NUMBERS, user_id)
     return [dict(record) for record in records]
 
 async def delete_number(number):
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            await conn.execute(""" 
-                DELETE FROM numbers WHERE number = $1 
-            """, number)
+            status = await conn.fetchval(DELETE_NUMBER, number)
+        if status is None:
+            return f"Номер {number} не найден."
+        hold_scheduler.cancel(number)
+        await page_cache.invalidate(status)
         return f"Номер {number} удален из списка ожидания."
     except Exception as e:
         logger.error(f"Error deleting number: {e}")
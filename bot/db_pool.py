@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import logging
+import os
+import time
+import asyncpg
+from contextlib import asynccontextmanager
+from bot.metrics import Histogram, histogram_lines, register_collector, query_duration, query_errors
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# При работе через pgbouncer в режиме transaction нужно выставить 0
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", 300))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", 30))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 10))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "postbot")
+# Через сколько секунд простоя соединение сессии возвращается в пул
+DB_SESSION_IDLE_RELEASE = float(os.getenv("DB_SESSION_IDLE_RELEASE", 0.05))
+
+# Соединение текущего апдейта; устанавливается DbSessionMiddleware
+_session = contextvars.ContextVar("db_session", default=None)
+
+class DbSession:
+    """
+    Соединение, общее для запросов, идущих подряд при обработке одного апдейта.
+    Берется из пула лениво, при первом запросе. Если за DB_SESSION_IDLE_RELEASE
+    секунд нового запроса нет (обработчик ждет Telegram), соединение
+    возвращается в пул и при следующем запросе берется заново.
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.pool = None
+        self.busy = False
+        self.closed = False
+        self._idle_timer = None
+        self._release_task = None
+
+    def cancel_idle(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def schedule_idle_release(self):
+        self.cancel_idle()
+        self._idle_timer = asyncio.get_running_loop().call_later(DB_SESSION_IDLE_RELEASE, self._on_idle)
+
+    def _on_idle(self):
+        self._idle_timer = None
+        self._release_task = asyncio.ensure_future(self.release())
+
+    async def release(self):
+        self.cancel_idle()
+        # Соединение могли снова занять, пока задача освобождения ждала запуска
+        if self.conn is None or self.busy:
+            return
+        conn, self.conn = self.conn, None
+        await self.pool.raw.release(conn)
+
+class _Acquire:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+        self._session = None
+
+    async def __aenter__(self):
+        session = _session.get()
+        # Занятое соединение сессии нельзя использовать параллельно — берем отдельное
+        if session is not None and not session.closed and not session.busy:
+            session.cancel_idle()
+            session.busy = True
+            if session.conn is None:
+                try:
+                    session.conn = await self._pool._acquire_raw(self._timeout)
+                except Exception:
+                    session.busy = False
+                    raise
+                session.pool = self._pool
+            self._session = session
+            return session.conn
+        self._conn = await self._pool._acquire_raw(self._timeout)
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        if self._session is not None:
+            self._session.busy = False
+            if self._session.closed:
+                await self._session.release()
+            else:
+                self._session.schedule_idle_release()
+            return
+        await self._pool.raw.release(self._conn)
+
+@asynccontextmanager
+async def session_scope():
+    session = DbSession()
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+        session.closed = True
+        await session.release()
+
+class InstrumentedPool:
+    """
+    Обертка над пулом asyncpg, которая измеряет время ожидания соединения.
+    Интерфейс acquire() совпадает с asyncpg.Pool, поэтому код в database.py не меняется.
+    Внутри session_scope() acquire() отдает соединение сессии вместо нового.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.acquire_wait = Histogram()
+        self.acquire_timeouts = 0
+        self.connections_opened = 0
+        self.waiting = 0
+
+    def acquire(self, timeout=DB_ACQUIRE_TIMEOUT):
+        return _Acquire(self, timeout)
+
+    async def _acquire_raw(self, timeout):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            return await self.raw.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+            self.acquire_wait.observe(time.monotonic() - started)
+
+    def stats(self):
+        size = self.raw.get_size()
+        idle = self.raw.get_idle_size()
+        return {
+            'size': size,
+            'in_use': size - idle,
+            'idle': idle,
+            'min_size': self.raw.get_min_size(),
+            'max_size': self.raw.get_max_size(),
+            'waiting': self.waiting,
+            'acquire_timeouts': self.acquire_timeouts,
+            'connections_opened': self.connections_opened,
+            'acquire_wait': self.acquire_wait,
+        }
+
+    async def collect(self):
+        stats = self.stats()
+        lines = []
+        for name, key, documentation in (
+            ("db_pool_connections_in_use", 'in_use', "Connections checked out of the pool."),
+            ("db_pool_connections_idle", 'idle', "Idle connections in the pool."),
+            ("db_pool_waiting", 'waiting', "Callers waiting for a connection."),
+        ):
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {stats[key]}"]
+        for name, key, documentation in (
+            ("db_pool_acquire_timeouts_total", 'acquire_timeouts', "Connection acquire timeouts."),
+            ("db_pool_connections_opened_total", 'connections_opened', "Connections opened by the pool."),
+        ):
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} counter", f"{name} {stats[key]}"]
+        lines += ["# HELP db_pool_acquire_wait_seconds Time spent waiting for a connection.", "# TYPE db_pool_acquire_wait_seconds histogram"]
+        lines += histogram_lines("db_pool_acquire_wait_seconds", self.acquire_wait)
+        return lines
+
+    async def close(self):
+        await self.raw.close()
+
+@functools.lru_cache(maxsize=1024)
+def _query_label(query):
+    """
+    Метка запроса для метрик: начало нормализованного текста для читаемости
+    и хэш полного текста, чтобы запросы с одинаковым началом не сливались.
+    """
+    text = " ".join(query.split())
+    digest = hashlib.sha1(text.encode()).hexdigest()[:10]
+    return f"{text[:60]} #{digest}"
+
+def _log_query(record):
+    label = _query_label(record.query)
+    query_duration.observe(record.elapsed, label)
+    if record.exception is not None:
+        query_errors.inc(label)
+
+async def create_pool(host, port, user, password, database):
+    pool = None
+
+    async def init_connection(conn):
+        conn.add_query_logger(_log_query)
+        if pool is not None:
+            pool.connections_opened += 1
+
+    raw = await asyncpg.create_pool(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        server_settings={'application_name': DB_APPLICATION_NAME},
+        init=init_connection,
+    )
+    pool = InstrumentedPool(raw)
+    # Соединения min_size открыты до создания обертки
+    pool.connections_opened = raw.get_size()
+    register_collector(pool.collect)
+    return pool
+
+async def connect_for_schema(host, port, user, password, database):
+    """
+    Отдельное соединение для миграций и обслуживания схемы. В отличие от пула
+    здесь нет command_timeout: перестройка таблицы, построение индексов
+    и ожидание schema_lock другими репликами могут длиться дольше DB_COMMAND_TIMEOUT.
+    """
+    return await asyncpg.connect(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database,
+        command_timeout=None,
+        statement_cache_size=0,
+        server_settings={'application_name': f"{DB_APPLICATION_NAME}-schema", 'statement_timeout': '0'},
+    )
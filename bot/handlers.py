@@ -3,14 +3,29 @@ from aiogram.types import Message, CallbackQuery, User, ChatMemberUpdated
 from aiogram.filters import Command, CommandObject, ChatMemberUpdatedFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from bot.utils import build_pagination_keyboard, format_list, convert_utc_to_msk
+from bot.utils import (
+    build_pagination_keyboard, format_list, convert_utc_to_msk,
+    encode_cursor, decode_cursor, encode_id_cursor, decode_id_cursor, parse_numbers, normalize_number,
+    parse_number_list, format_bulk_result
+)
 from bot.database import (
-    add_to_waiting, move_to_hold, mark_as_successful,  clear_all,
-    get_list_by_status, get_all_records, count_records, find_record_by_number,
-    set_user_admin, is_admin, get_user_numbers, delete_number, mark_as_failed
+    add_to_waiting, add_many_to_waiting, move_to_hold, mark_as_successful,  clear_all,
+    get_list_by_status, get_all_records, count_records, count_by_status, find_record_by_number,
+    set_user_admin, is_admin, get_user_numbers, delete_number, mark_as_failed,
+    rebuild_counters, move_many_to_hold, mark_many_as_successful, mark_many_as_failed,
+    get_pool_stats, get_query_plans
 )
+from bot.scheduler import hold_scheduler
+from bot.user_cache import user_cache
+from bot.admin_cache import admin_cache
+from bot.page_cache import page_cache
+from bot.status import Status
+from bot.middlewares import UserDirectoryMiddleware, DbSessionMiddleware, HandlerMetricsMiddleware
 from aiogram.filters import BaseFilter
 from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 class SearchStates(StatesGroup):
     waiting_for_number = State()
@@ -21,12 +36,31 @@ class IsNewChatMemberFilter(BaseFilter):
 
 redis = None
 
+# Заголовки списков; одинаковые для команд и кнопок, чтобы страницы из кэша совпадали
+STATUS_TITLES = {
+    Status.WAITING: "Ожидание",
+    Status.HOLD: "Холдинг",
+    Status.SUCCESS: "Успешно",
+    Status.FAILED: "Слетели",
+}
+ALL_TITLE = "Общий список всех номеров"
+
 def setup_handlers(dp: Dispatcher, redis_instance):
     global redis
     redis = redis_instance
+    user_cache.redis = redis_instance
+    admin_cache.redis = redis_instance
+    page_cache.redis = redis_instance
+    dp.update.outer_middleware(DbSessionMiddleware())
+    dp.message.outer_middleware(UserDirectoryMiddleware())
+    dp.callback_query.outer_middleware(UserDirectoryMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.chat_member.middleware(HandlerMetricsMiddleware())
     dp.message.register(search_handler, Command(commands=["search"]))
     dp.message.register(number_search_handler, SearchStates.waiting_for_number)
     dp.message.register(add_number_handler, Command(commands=["a"]))
+    dp.message.register(bulk_add_handler, Command(commands=["ab"]))
     dp.message.register(hold_number_handler, Command(commands=["c"]))
     dp.message.register(successful_number_handler, Command(commands=["success"]))
     dp.message.register(failed_number_handler, Command(commands=["s"]))
@@ -43,6 +77,9 @@ def setup_handlers(dp: Dispatcher, redis_instance):
     dp.message.register(stata_handler, Command(commands=["stata"]))
     dp.message.register(set_hold_duration_handler, Command(commands=["h"]))
     dp.message.register(delete_number_handler, Command(commands=["aa"]))
+    dp.message.register(recount_handler, Command(commands=["recount"]))
+    dp.message.register(dbstats_handler, Command(commands=["dbstats"]))
+    dp.message.register(plans_handler, Command(commands=["plans"]))
     dp.callback_query.register(paginate_list, lambda c: c.data.startswith("page:"))
     dp.callback_query.register(search_handler, lambda c: c.data.startswith("search:"))
     dp.chat_member.register(user_joined_handler, IsNewChatMemberFilter())
@@ -52,45 +89,94 @@ async def user_joined_handler(event: ChatMemberUpdated):
     await set_user_admin(user_id, is_admin=False)
 
 async def paginate_list(callback: CallbackQuery):
-    _, status, current_page = callback.data.split(":")
+    _, status, current_page, *cursor = callback.data.split(":")
     current_page = int(current_page)
-    limit = 10
-    offset = (current_page - 1) * limit
+    cursor = cursor[0] if cursor else None
 
     if status == "all":
-        records = await get_all_records(limit=limit, offset=offset)
-        records = await add_user_tags(records, callback.bot)  # Added this line
-        total_records = await count_records()
-        title = "Общий список"
+        response, keyboard = await render_all_page(ALL_TITLE, callback.bot, current_page, cursor)
     else:
-        records = await get_list_by_status(status, limit=limit, offset=offset)
-        records = await add_user_tags(records, callback.bot)  # Added this line
-        total_records = await count_records(status=status)
-        title = f"Список по статусу {status}"
+        try:
+            status = Status(int(status))
+        except ValueError:
+            # Кнопки сообщений, отправленных до перехода на числовые статусы
+            await callback.answer("Список устарел, запросите его заново.")
+            return
+        response, keyboard = await render_status_page(status, STATUS_TITLES[status], callback.bot, current_page, cursor)
 
-    total_pages = (total_records + limit - 1) // limit
+    await callback.message.edit_text(response, reply_markup=keyboard, parse_mode="HTML")
 
-    if not records:
-        response = f"{title} пуст."
+async def render_status_page(status, title, bot, current_page=1, cursor=None, limit=10):
+    """
+    Собирает страницу списка по статусу.
+    cursor — позиция из callback data: ">ключ" для следующей страницы, "<ключ" для предыдущей.
+    """
+    cache_key, cached = await page_cache.get(status, current_page, cursor)
+    if cached:
+        return cached
+    after = before = None
+    if cursor:
+        position = decode_cursor(cursor[1:])
+        if cursor[0] == ">":
+            after = position
+        else:
+            before = position
+    total_records = await count_records(status=status)
+    total_pages = (total_records + limit - 1) // limit
+    records = await get_list_by_status(status, limit=limit, after=after, before=before)
+    records = await add_user_tags(records, bot)
+    response = format_list(records, title, current_page, total_pages)
+    if records:
+        keyboard = build_pagination_keyboard(
+            current_page, total_pages, status=status,
+            first_cursor=encode_cursor(records[0]), last_cursor=encode_cursor(records[-1])
+        )
     else:
-        response = format_list(records, title, current_page, total_pages)
-
-    keyboard = build_pagination_keyboard(current_page, total_pages, status=status)
-    await callback.message.edit_text(response, reply_markup=keyboard, parse_mode="HTML")
+        keyboard = build_pagination_keyboard(current_page, total_pages, status=status)
+    await page_cache.set(cache_key, response, keyboard)
+    return response, keyboard
+
+async def render_all_page(title, bot, current_page=1, cursor=None, limit=10):
+    """
+    Собирает страницу общего списка по ключу id.
+    cursor — ">id" для следующей страницы, "<id" для предыдущей.
+    """
+    cache_key, cached = await page_cache.get("all", current_page, cursor)
+    if cached:
+        return cached
+    last_id = before_id = None
+    if cursor:
+        record_id = decode_id_cursor(cursor[1:])
+        if cursor[0] == ">":
+            last_id = record_id
+        else:
+            before_id = record_id
+    total_records = await count_records()
+    total_pages = (total_records + limit - 1) // limit
+    records = await get_all_records(limit=limit, last_id=last_id, before_id=before_id)
+    records = await add_user_tags(records, bot)
+    response = format_list(records, title, current_page, total_pages)
+    if records:
+        keyboard = build_pagination_keyboard(
+            current_page, total_pages, status="all",
+            first_cursor=encode_id_cursor(records[0]), last_cursor=encode_id_cursor(records[-1])
+        )
+    else:
+        keyboard = build_pagination_keyboard(current_page, total_pages, status="all")
+    await page_cache.set(cache_key, response, keyboard)
+    return response, keyboard
 
 async def search_handler(callback: CallbackQuery, state: FSMContext):
     await callback.message.reply("Введите номер для поиска:")
     await state.set_state(SearchStates.waiting_for_number)
 
 async def number_search_handler(message: Message, state: FSMContext):
-    number = message.text.strip()
+    # Номера хранятся нормализованными, как их сохраняет /a; текст не в формате номера ищется как есть
+    number = normalize_number(message.text) or message.text.strip()
     record = await find_record_by_number(number)
     if record:
-        try:
-            user = await message.bot.get_chat(record['user_id'])
-            user_tag = f"<a href='tg://user?id={user.id}'>{user.full_name}</a>"
-        except:
-            user_tag = "Пользователь не найден"
+        tags = await user_cache.get_tags(message.bot, [record['user_id']])
+        user_tag = tags[record['user_id']]
 
         # Преобразуем время из UTC в MSK
         msk_time = convert_utc_to_msk(record['timestamp'])
@@ -100,7 +186,7 @@ async def number_search_handler(message: Message, state: FSMContext):
             f"ID: {record['id']}\n"
             f"Номер: {record['number']}\n"
             f"Пользователь: {user_tag}\n"
-            f"Статус: {record['status']}\n"
+            f"Статус: {Status(record['status']).label}\n"
             f"Дата: {msk_time.strftime('%Y-%m-%d %H:%M')}"  # Отображаем время по MSK
         )
     else:
@@ -113,39 +199,56 @@ async def add_number_handler(message: Message):
     if len(args) < 2:
         await message.reply("Укажите номер! Пример: /a 123456789")
         return
-    number = args[1]
+    number = normalize_number(args[1])
+    if number is None:
+        await message.reply(f"Неверный формат номера: {args[1]}")
+        return
     response = await add_to_waiting(message.from_user.id, number, message.chat.id)
     await message.reply(response)
 
+MAX_INTAKE_FILE_SIZE = 1024 * 1024
+
+async def bulk_add_handler(message: Message, command: CommandObject):
+    text = command.args or ""
+    if message.document:
+        if message.document.file_size and message.document.file_size > MAX_INTAKE_FILE_SIZE:
+            await message.reply("Файл слишком большой (максимум 1 МБ).")
+            return
+        content = await message.bot.download(message.document)
+        text += "\n" + content.read().decode("utf-8", errors="ignore")
+    numbers, duplicates, invalid = parse_numbers(text)
+    if not numbers and not invalid:
+        await message.reply("Укажите номера или прикрепите файл! Пример: /ab 123456789 987654321")
+        return
+    try:
+        added = await add_many_to_waiting(message.from_user.id, numbers, message.chat.id)
+    except Exception as e:
+        logger.error(f"Error adding numbers in bulk: {e}")
+        await message.reply(f"Произошла ошибка: {e}")
+        return
+    duplicates += len(numbers) - added
+    await message.reply(
+        f"Добавлено: {added}\n"
+        f"Дубликаты: {duplicates}\n"
+        f"Невалидные: {invalid}"
+    )
+
 async def list_all_handler(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
-    limit = 10
-    offset = 0
-    current_page = 1
-    records = await get_all_records(limit=limit, offset=offset)
-    records = await add_user_tags(records, message.bot)  # Added this line
-    total_records = await count_records()
-    total_pages = (total_records + limit - 1) // limit
-
-    if not records:
-        response = "Список пуст."
-    else:
-        response = format_list(records, "Общий список всех номеров", current_page, total_pages)
-
-    keyboard = build_pagination_keyboard(current_page, total_pages, status="all")
-    await message.reply(response, reply_markup=keyboard, parse_mode="Markdown")
+    response, keyboard = await render_all_page(ALL_TITLE, message.bot)
+    await message.reply(response, reply_markup=keyboard, parse_mode="HTML")
 
 async def hold_number_handler(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
     args = message.text.split(maxsplit=1)
-    if len(args) < 2:
+    numbers, invalid = parse_number_list(args[1]) if len(args) > 1 else ([], [])
+    if not numbers and not invalid:
         await message.reply("Укажите номер! Пример: /c 123456789")
         return
-    number = args[1]
 
     # Get global hold duration from Redis
     hold_duration_str = await redis.get("global_hold_duration")
@@ -154,7 +257,15 @@ async def hold_number_handler(message: Message):
         hold_duration_timedelta = timedelta(seconds=hold_duration)  # Используем seconds
     else:
         hold_duration_timedelta = None
-    response = await move_to_hold(number, hold_duration=hold_duration_timedelta, hold_set_by=message.from_user.id, chat_id=message.chat.id)
+    if len(numbers) > 1 or invalid:
+        try:
+            changed = await move_many_to_hold(numbers, hold_duration=hold_duration_timedelta, hold_set_by=message.from_user.id, chat_id=message.chat.id)
+            response = format_bulk_result("Взято в холд", numbers, changed, invalid)
+        except Exception as e:
+            logger.error(f"Error moving numbers to hold: {e}")
+            response = f"Произошла ошибка: {e}"
+    else:
+        response = await move_to_hold(numbers[0], hold_duration=hold_duration_timedelta, hold_set_by=message.from_user.id, chat_id=message.chat.id)
     await message.reply(response)
 
 
@@ -163,12 +274,19 @@ async def successful_number_handler(message: Message):
         await message.reply("У вас нет доступа к этой команде.")
         return
     args = message.text.split(maxsplit=1)
-    if len(args) < 2:
+    numbers, invalid = parse_number_list(args[1]) if len(args) > 1 else ([], [])
+    if not numbers and not invalid:
         await message.reply("Укажите номер! Пример: /success 123456789")
         return
-
-    number = args[1]
-    response = await mark_as_successful(number)
+    if len(numbers) > 1 or invalid:
+        try:
+            changed = await mark_many_as_successful(numbers, message.chat.id, message.bot)
+            response = format_bulk_result("Успешно", numbers, changed, invalid)
+        except Exception as e:
+            logger.error(f"Error marking numbers as successful: {e}")
+            response = f"Произошла ошибка: {e}"
+    else:
+        response = await mark_as_successful(numbers[0], message.chat.id, message.bot)
     await message.reply(response)
 
 async def failed_number_handler(message: Message):
@@ -176,12 +294,19 @@ async def failed_number_handler(message: Message):
         await message.reply("У вас нет доступа к этой команде.")
         return
     args = message.text.split(maxsplit=1)
-    if len(args) < 2:
+    numbers, invalid = parse_number_list(args[1]) if len(args) > 1 else ([], [])
+    if not numbers and not invalid:
         await message.reply("Укажите номер! Пример: /s 123456789")
         return
-
-    number = args[1]
-    response = await mark_as_failed(number)
+    if len(numbers) > 1 or invalid:
+        try:
+            changed = await mark_many_as_failed(numbers)
+            response = format_bulk_result("Слетели", numbers, changed, invalid)
+        except Exception as e:
+            logger.error(f"Error marking numbers as failed: {e}")
+            response = f"Произошла ошибка: {e}"
+    else:
+        response = await mark_as_failed(numbers[0])
     await message.reply(response)
 
 async def clear_all_handler(message: Message):
@@ -192,82 +317,48 @@ async def clear_all_handler(message: Message):
     await message.reply(response)
 
 async def add_user_tags(records, bot):
+    tags = await user_cache.get_tags(bot, [record['user_id'] for record in records])
     for record in records:
-        try:
-            user = await bot.get_chat(record['user_id'])
-            record['user_tag'] = f"<a href='tg://user?id={user.id}'>{user.full_name}</a>"
-        except Exception as e:
-            logger.error(f"Error fetching user {record['user_id']}: {e}")
-            record['user_tag'] = "Пользователь не найден"
+        record['user_tag'] = tags[record['user_id']]
     return records
 
 async def get_waiting_list(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
-    limit = 10
-    offset = 0
-    current_page = 1
-    total_records = await count_records(status="🔵 Ожидание")
-    total_pages = (total_records + limit - 1) // limit
-    records = await get_list_by_status("🔵 Ожидание", limit=limit, offset=offset)
-    records = await add_user_tags(records, message.bot)
-    response = format_list(records, "Ожидание", current_page, total_pages)
-    keyboard = build_pagination_keyboard(current_page, total_pages, status="🔵 Ожидание")
+    response, keyboard = await render_status_page(Status.WAITING, STATUS_TITLES[Status.WAITING], message.bot)
     await message.reply(response, reply_markup=keyboard, parse_mode="HTML")
 
 async def get_hold_list(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
-    limit = 10
-    offset = 0
-    current_page = 1
-    total_records = await count_records(status="🟠 Холдинг")
-    total_pages = (total_records + limit - 1) // limit
-    records = await get_list_by_status("🟠 Холдинг", limit=limit, offset=offset)
-    records = await add_user_tags(records, message.bot)  # Ensure this is present
-    response = format_list(records, "Холдинг", current_page, total_pages)
-    keyboard = build_pagination_keyboard(current_page, total_pages, status="🟠 Холдинг")
+    response, keyboard = await render_status_page(Status.HOLD, STATUS_TITLES[Status.HOLD], message.bot)
     await message.reply(response, reply_markup=keyboard, parse_mode="HTML")
 
 async def get_successful_list(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
-    limit = 10
-    offset = 0
-    current_page = 1
-    total_records = await count_records(status="🟢 Успешно")
-    total_pages = (total_records + limit - 1) // limit
-    records = await get_list_by_status("🟢 Успешно", limit=limit, offset=offset)
-    records = await add_user_tags(records, message.bot)
-    response = format_list(records, "Успешно", current_page, total_pages)
-    keyboard = build_pagination_keyboard(current_page, total_pages, status="🟢 Успешно")
+    response, keyboard = await render_status_page(Status.SUCCESS, STATUS_TITLES[Status.SUCCESS], message.bot)
     await message.reply(response, reply_markup=keyboard, parse_mode="HTML")
 
 async def get_failed_list(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
-    limit = 10
-    offset = 0
-    current_page = 1
-    total_records = await count_records(status="🔴 Слетел")
-    total_pages = (total_records + limit - 1) // limit
-    records = await get_list_by_status("🔴 Слетел", limit=limit, offset=offset)
-    records = await add_user_tags(records, message.bot)
-    response = format_list(records, "Слетели", current_page, total_pages)
-    keyboard = build_pagination_keyboard(current_page, total_pages, status="🔴 Слетел")
+    response, keyboard = await render_status_page(Status.FAILED, STATUS_TITLES[Status.FAILED], message.bot)
     await message.reply(response, reply_markup=keyboard, parse_mode="HTML")
 
 async def help_handler(message: Message):
     if await is_admin(message.from_user.id):
         help_text = (
             "/a {номер} — Добавить номер в ожидание.\n"
+            "/ab {номера} — Добавить много номеров (можно прикрепить файл).\n"
             "/c {номер} — Взять номер в холд.\n"
             "/success {номер} — Пометить номер как успешный.\n"
             "/s {номер} — Пометить номер как слетевший.\n"
+            "/c, /success и /s принимают несколько номеров через пробел или диапазон 100..110.\n"
             "/clear — Очистить все списки.\n"
             "/wl — Показать список ожидания.\n"
             "/hl — Показать список холда.\n"
@@ -280,11 +371,15 @@ async def help_handler(message: Message):
             "/my {user_id} — Показать статистику другого пользователя.\n"
             "/stata — Показать полную статистику (только для админов).\n"
             "/h {hours} — Установить время холда.\n"
-            "/aa {номер} — Удалить номер из списка ожидания."
+            "/aa {номер} — Удалить номер из списка ожидания.\n"
+            "/recount — Пересчитать счетчики номеров.\n"
+            "/dbstats — Состояние пула соединений с базой.\n"
+            "/plans — Проверить, что запросы используют индексы."
         )
     else:
         help_text = (
             "/a {номер} — Добавить номер в ожидание.\n"
+            "/ab {номера} — Добавить много номеров (можно прикрепить файл).\n"
             "/wl — Показать список ожидания.\n"
             "/hl — Показать список холда.\n"
             "/gl — Показать успешные номера.\n"
@@ -345,7 +440,8 @@ async def deladmin_handler(message: Message, command: CommandObject):
     await message.reply(f"Пользователь {user_input} лишен админских прав.")
 
 async def my_handler(message: Message, command: CommandObject):
-    target_user = message.from_user
+    target_id = message.from_user.id
+    target_name = message.from_user.full_name
     if command.args:
         if not await is_admin(message.from_user.id):
             await message.reply("У вас нет доступа к этой команде.")
@@ -355,40 +451,36 @@ async def my_handler(message: Message, command: CommandObject):
         except ValueError:
             await message.reply("Неверный формат user_id.")
             return
-        target_user = await message.bot.get_chat(user_id)
-    counts = await format_user_numbers_counts(target_user.id)
+        names = await user_cache.get_names(message.bot, [user_id])
+        target_id = user_id
+        target_name = names[user_id] or "Пользователь не найден"
+    counts = await format_user_numbers_counts(target_id)
     response = (
-        f"Статистика для {target_user.full_name} (id: {target_user.id}):\n\n"
+        f"Статистика для {target_name} (id: {target_id}):\n\n"
         f"{counts}"
     )
     await message.reply(response, parse_mode="Markdown")
 
 async def format_user_numbers_counts(user_id):
-    waiting = await count_records(user_id=user_id, status="🔵 Ожидание")
-    holding = await count_records(user_id=user_id, status="🟠 Холдинг")
-    successful = await count_records(user_id=user_id, status="🟢 Успешно")
-    failed = await count_records(user_id=user_id, status="🔴 Слетел")
+    counts = await count_by_status(user_id=user_id)
     return (
-        f"Ожидание: {waiting}\n"
-        f"Холд: {holding}\n"
-        f"Успешные: {successful}\n"
-        f"Слетевшие: {failed}"
+        f"Ожидание: {counts[Status.WAITING]}\n"
+        f"Холд: {counts[Status.HOLD]}\n"
+        f"Успешные: {counts[Status.SUCCESS]}\n"
+        f"Слетевшие: {counts[Status.FAILED]}"
     )
 
 async def stata_handler(message: Message):
     if not await is_admin(message.from_user.id):
         await message.reply("У вас нет доступа к этой команде.")
         return
-    waiting = await count_records(status="🔵 Ожидание")
-    holding = await count_records(status="🟠 Холдинг")
-    successful = await count_records(status="🟢 Успешно")
-    failed = await count_records(status="🔴 Слетел")
+    counts = await count_by_status()
     response = (
         f"Полная статистика:\n\n"
-        f"Ожидание: {waiting}\n"
-        f"Холд: {holding}\n"
-        f"Успешные: {successful}\n"
-        f"Слетевшие: {failed}"
+        f"Ожидание: {counts[Status.WAITING]}\n"
+        f"Холд: {counts[Status.HOLD]}\n"
+        f"Успешные: {counts[Status.SUCCESS]}\n"
+        f"Слетевшие: {counts[Status.FAILED]}"
     )
     await message.reply(response)
 
@@ -403,6 +495,7 @@ async def set_hold_duration_handler(message: Message, command: CommandObject):
     time_str = command.args
     if time_str == "0":
         await redis.delete("global_hold_duration")
+        hold_scheduler.wake()
         await message.reply("Холд установлен на бессрочно.")
         return
     import re
@@ -417,6 +510,7 @@ async def set_hold_duration_handler(message: Message, command: CommandObject):
     elif unit == 'm':
         hold_duration = value * 60
     await redis.set("global_hold_duration", hold_duration)
+    hold_scheduler.wake()
     await message.reply(f"Время холда установлено на {time_str}.")
 
 async def delete_number_handler(message: Message, command: CommandObject):
@@ -426,6 +520,60 @@ async def delete_number_handler(message: Message, command: CommandObject):
     if not command.args:
         await message.reply("Укажите номер! Пример: /aa 123456789")
         return
-    number = command.args
+    number = normalize_number(command.args) or command.args.strip()
     response = await delete_number(number)
-    await message.reply(response)
\ No newline at end of file
+    await message.reply(response)
+
+async def recount_handler(message: Message):
+    if not await is_admin(message.from_user.id):
+        await message.reply("У вас нет доступа к этой команде.")
+        return
+    try:
+        await rebuild_counters()
+        await message.reply("Счетчики номеров пересчитаны.")
+    except Exception as e:
+        await message.reply(f"Произошла ошибка: {e}")
+
+async def dbstats_handler(message: Message):
+    if not await is_admin(message.from_user.id):
+        await message.reply("У вас нет доступа к этой команде.")
+        return
+    stats = await get_pool_stats()
+    wait = stats['acquire_wait']
+    average = wait.sum / wait.count * 1000 if wait.count else 0
+    buckets = "\n".join(
+        f"≤ {bound * 1000:g} мс: {count}" if bound != float("inf") else f"всего: {count}"
+        for bound, count in wait.cumulative()
+    )
+    response = (
+        f"Пул соединений:\n\n"
+        f"Занято: {stats['in_use']}\n"
+        f"Свободно: {stats['idle']}\n"
+        f"Размер: {stats['size']} (мин. {stats['min_size']}, макс. {stats['max_size']})\n"
+        f"Ждут соединения: {stats['waiting']}\n"
+        f"Таймауты ожидания: {stats['acquire_timeouts']}\n"
+        f"Открыто соединений: {stats['connections_opened']}\n"
+        f"Среднее ожидание: {average:.2f} мс\n\n"
+        f"Ожидание соединения:\n{buckets}"
+    )
+    await message.reply(response)
+
+MAX_MESSAGE_LENGTH = 4096
+
+async def plans_handler(message: Message):
+    if not await is_admin(message.from_user.id):
+        await message.reply("У вас нет доступа к этой команде.")
+        return
+    try:
+        results = await get_query_plans()
+    except Exception as e:
+        await message.reply(f"Произошла ошибка: {e}")
+        return
+    lines = [
+        # В секционированной таблице одно и то же сканирование повторяется по каждой секции
+        f"{'✅' if ok else '❌'} {name}: {', '.join(dict.fromkeys(f'{node_type} {target}' for node_type, target in scans))}"
+        for name, ok, scans in results
+    ]
+    failed = sum(1 for _, ok, _ in results if not ok)
+    response = f"Планы запросов (без индекса: {failed}):\n\n" + "\n".join(lines)
+    await message.reply(response[:MAX_MESSAGE_LENGTH])
\ No newline at end of file
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "bot_leader"
+LEADER_TTL = float(os.getenv("LEADER_TTL", 15))
+
+# Продлевает или снимает аренду, только если она все еще принадлежит нам
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class LeaderElection:
+    """
+    Выбор лидера среди реплик бота через аренду в Redis.
+    Лидер держит ключ с TTL и продлевает его каждые TTL/3 секунд.
+    Фоновые задачи работают только на лидере; если аренду продлить не удалось,
+    задачи останавливаются, а после истечения TTL лидерство забирает другая реплика.
+    """
+
+    def __init__(self, redis, key=LEADER_KEY, ttl=LEADER_TTL):
+        self.redis = redis
+        self.key = key
+        self.ttl = ttl
+        self.renew_interval = ttl / 3
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    async def _acquire(self):
+        try:
+            return bool(await self.redis.set(self.key, self.identity, nx=True, px=int(self.ttl * 1000)))
+        except Exception as e:
+            logger.error(f"Error acquiring leadership: {e}")
+            return False
+
+    async def _renew(self):
+        return await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.identity, int(self.ttl * 1000)) == 1
+
+    async def release(self):
+        try:
+            await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.identity)
+        except Exception as e:
+            logger.error(f"Error releasing leadership: {e}")
+
+    async def _hold_lease(self):
+        """
+        Продлевает аренду, пока это удается. Возвращается, когда лидерство потеряно.
+        """
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                if not await self._renew():
+                    logger.warning("Leadership lease lost.")
+                    return
+                renewed_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error renewing leadership: {e}")
+                # Без связи с Redis уходим раньше, чем аренда истечет и ее заберет другая реплика
+                if time.monotonic() - renewed_at + self.renew_interval >= self.ttl:
+                    return
+
+    async def run(self, jobs):
+        """
+        jobs — функции без аргументов, возвращающие корутины фоновых задач.
+        Отмена задачи run() останавливает фоновые задачи и снимает аренду.
+        """
+        while True:
+            if not await self._acquire():
+                await asyncio.sleep(self.renew_interval)
+                continue
+            self.is_leader = True
+            logger.info(f"Became leader: {self.identity}")
+            tasks = [asyncio.create_task(job()) for job in jobs]
+            try:
+                await self._hold_lease()
+            finally:
+                self.is_leader = False
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                # При остановке реплики аренду снимаем сразу, чтобы другая не ждала истечения TTL
+                await self.release()
+                logger.info("Background jobs stopped, leadership given up.")
@@ -0,0 +1,174 @@
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+# Границы корзин гистограмм в секундах
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами, как в Prometheus.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Возвращает [(граница, накопленное количество)], последняя граница — inf.
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+def histogram_lines(name, histogram, labelnames=(), labelvalues=()):
+    lines = []
+    for bound, count in histogram.cumulative():
+        lines.append(f"{name}_bucket{_labels(labelnames, labelvalues, [('le', _format_bound(bound))])} {count}")
+    lines.append(f"{name}_sum{_labels(labelnames, labelvalues)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labelnames, labelvalues)} {histogram.count}")
+    return lines
+
+_registry = []
+_collectors = []
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+class Timer:
+    """
+    Семейство гистограмм длительности с метками.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._histograms = {}
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        histogram = self._histograms.get(labelvalues)
+        if histogram is None:
+            histogram = self._histograms[labelvalues] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, *labelvalues)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, histogram in self._histograms.items():
+            lines.extend(histogram_lines(self.name, histogram, self.labelnames, labelvalues))
+        return lines
+
+class Gauge:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        _registry.append(self)
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+def register_collector(collector):
+    """
+    collector — async-функция, возвращающая строки метрик в текстовом формате Prometheus.
+    """
+    _collectors.append(collector)
+
+async def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            lines.extend(await collector())
+        except Exception as e:
+            logger.error(f"Metrics collector error: {e}")
+    return "\n".join(lines) + "\n"
+
+handler_duration = Timer("bot_handler_duration_seconds", "Handler latency.", ["handler"])
+handler_errors = Counter("bot_handler_errors_total", "Handler exceptions.", ["handler"])
+query_duration = Timer("db_query_duration_seconds", "SQL statement latency.", ["query"])
+query_errors = Counter("db_query_errors_total", "Failed SQL statements.", ["query"])
+telegram_requests = Counter("telegram_api_requests_total", "Telegram Bot API calls.", ["method"])
+telegram_errors = Counter("telegram_api_errors_total", "Failed Telegram Bot API calls.", ["method"])
+telegram_duration = Timer("telegram_api_duration_seconds", "Telegram Bot API call latency.", ["method"])
+task_duration = Timer("background_task_duration_seconds", "Background job run time.", ["task"], buckets=DEFAULT_BUCKETS + (30.0, 60.0, 300.0))
+retention_rows = Counter("retention_rows_deleted_total", "Expired rows removed by the retention job.")
+retention_lag = Gauge("retention_lag_seconds", "Age of the oldest expired row still in the table.")
+task_errors = Counter("background_task_errors_total", "Failed background job runs.", ["task"])
+
+async def metrics_handler(request):
+    return web.Response(text=await render(), content_type="text/plain", charset="utf-8")
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Запускает HTTP-эндпоинт /metrics. Ничего не делает, если порт не задан.
+    """
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, int(port))
+    await site.start()
+    logger.info(f"Metrics endpoint listening on {host}:{port}/metrics")
+    return runner
@@ -0,0 +1,62 @@
+import time
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from bot.user_cache import user_cache
+from bot.db_pool import session_scope
+from bot.metrics import handler_duration, handler_errors, telegram_requests, telegram_errors, telegram_duration
+
+class UserDirectoryMiddleware(BaseMiddleware):
+    """
+    Записывает имена отправителей сообщений и нажатий кнопок в справочник пользователей.
+    """
+
+    async def __call__(self, handler, event, data):
+        user = getattr(event, "from_user", None)
+        if user is not None and not user.is_bot:
+            await user_cache.record(user.id, user.full_name)
+        return await handler(event, data)
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Открывает сессию базы данных на время обработки апдейта: функции
+    database.py, вызванные из обработчика подряд, используют одно соединение.
+    Пока обработчик ждет Telegram, соединение возвращается в пул (см. DbSession).
+    """
+
+    async def __call__(self, handler, event, data):
+        async with session_scope():
+            return await handler(event, data)
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Измеряет время работы обработчиков и считает их ошибки.
+    """
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        started = time.monotonic()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_duration.observe(time.monotonic() - started, name)
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Считает вызовы Telegram Bot API, их ошибки и время ответа.
+    """
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        telegram_requests.inc(name)
+        started = time.monotonic()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            telegram_errors.inc(name)
+            raise
+        finally:
+            telegram_duration.observe(time.monotonic() - started, name)
@@ -0,0 +1,81 @@
+import importlib
+import logging
+import os
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# Ключ advisory-блокировки, под которой схему меняет только одна реплика
+SCHEMA_LOCK_ID = 48151623
+
+def load_migrations():
+    """
+    Список миграций (version, name, path), упорядоченный по номеру.
+    Миграция — файл NNNN_name.sql или NNNN_name.py с функцией upgrade(conn).
+    """
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        name, ext = os.path.splitext(filename)
+        prefix = name.split("_", 1)[0]
+        if ext not in (".sql", ".py") or not prefix.isdigit():
+            continue
+        migrations.append((int(prefix), name, os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration versions")
+    return migrations
+
+async def current_version(conn):
+    exists = await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not exists:
+        return 0
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+
+@asynccontextmanager
+async def schema_lock(conn):
+    await conn.execute("SELECT pg_advisory_lock($1)", SCHEMA_LOCK_ID)
+    try:
+        yield
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", SCHEMA_LOCK_ID)
+
+async def apply_migration(conn, name, path):
+    if path.endswith(".sql"):
+        with open(path, encoding="utf-8") as f:
+            await conn.execute(f.read())
+    else:
+        module = importlib.import_module(f"bot.migrations.{name}")
+        await module.upgrade(conn)
+
+async def migrate(conn):
+    """
+    Применяет недостающие миграции, каждую в своей транзакции.
+    Если схема актуальна, ограничивается одним запросом к schema_version.
+    Возвращает количество примененных миграций.
+    """
+    migrations = load_migrations()
+    latest = migrations[-1][0] if migrations else 0
+    if await current_version(conn) >= latest:
+        return 0
+    applied = 0
+    async with schema_lock(conn):
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        # Пока ждали блокировку, миграции могла применить другая реплика
+        current = await current_version(conn)
+        for version, name, path in migrations:
+            if version <= current:
+                continue
+            async with conn.transaction():
+                await apply_migration(conn, name, path)
+                await conn.execute("INSERT INTO schema_version (version, name) VALUES ($1, $2)", version, name)
+            logger.info(f"Migration applied: {name}")
+            applied += 1
+    return applied
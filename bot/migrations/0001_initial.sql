@@ -0,0 +1,38 @@
+-- Базовая схема. Повторяет прежний init_db, поэтому безопасна и для баз,
+-- созданных до появления миграций.
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    is_admin BOOLEAN NOT NULL DEFAULT FALSE,
+    full_name TEXT
+);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS full_name TEXT;
+
+CREATE TABLE IF NOT EXISTS numbers (
+    id SERIAL PRIMARY KEY,
+    number TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    status TEXT NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL,
+    hold_start TIMESTAMPTZ,
+    hold_end TIMESTAMPTZ,
+    hold_duration INTERVAL
+);
+-- Базы, созданные старым reset_db, не имеют этих колонок
+ALTER TABLE numbers ADD COLUMN IF NOT EXISTS hold_time INTERVAL;
+ALTER TABLE numbers ADD COLUMN IF NOT EXISTS hold_set_by BIGINT REFERENCES users(user_id);
+ALTER TABLE numbers ADD COLUMN IF NOT EXISTS chat_id BIGINT;
+
+-- Составной индекс покрывает и фильтр по статусу, и постраничный вывод по (timestamp, id)
+CREATE INDEX IF NOT EXISTS idx_status_timestamp_id ON numbers (status, timestamp, id);
+DROP INDEX IF EXISTS idx_status;
+CREATE INDEX IF NOT EXISTS idx_timestamp ON numbers (timestamp);
+
+CREATE TABLE IF NOT EXISTS numbers_archive (
+    id INTEGER PRIMARY KEY,
+    number TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    status TEXT NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL,
+    hold_time INTERVAL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
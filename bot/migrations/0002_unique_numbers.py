@@ -0,0 +1,24 @@
+import logging
+from bot.partitions import is_partitioned
+
+logger = logging.getLogger(__name__)
+
+async def upgrade(conn):
+    """
+    Делает номер уникальным. Перед созданием уникального индекса удаляет
+    дубликаты, оставляя самую новую запись каждого номера.
+    В секционированной таблице уникальность держит number_keys,
+    поэтому там нужен только обычный индекс для поиска.
+    """
+    if await is_partitioned(conn):
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_number ON numbers (number)")
+        return
+    await conn.execute("LOCK TABLE numbers IN SHARE ROW EXCLUSIVE MODE")
+    deleted = await conn.execute("""
+        DELETE FROM numbers a
+        USING numbers b
+        WHERE a.number = b.number AND a.id < b.id
+    """)
+    logger.info(f"Duplicate numbers removed: {deleted}")
+    await conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_number_unique ON numbers (number)")
+    await conn.execute("DROP INDEX IF EXISTS idx_number")
@@ -0,0 +1,66 @@
+-- Счетчики номеров по (user_id, status). Строки с user_id = 0 (ALL_USERS
+-- в database.py) хранят итоги по всем пользователям.
+CREATE TABLE IF NOT EXISTS number_counters (
+    user_id BIGINT NOT NULL,
+    status TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (user_id, status)
+);
+
+-- Триггеры уровня оператора: массовые UPDATE/DELETE меняют счетчики одним запросом
+CREATE OR REPLACE FUNCTION apply_number_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO number_counters (user_id, status, count)
+        SELECT k.user_id, k.status, COUNT(*)
+        FROM new_rows n
+        CROSS JOIN LATERAL (VALUES (n.user_id, n.status), (0::bigint, n.status)) AS k(user_id, status)
+        GROUP BY k.user_id, k.status
+        ORDER BY k.user_id, k.status
+        ON CONFLICT (user_id, status) DO UPDATE SET count = number_counters.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO number_counters (user_id, status, count)
+        SELECT k.user_id, k.status, -COUNT(*)
+        FROM old_rows o
+        CROSS JOIN LATERAL (VALUES (o.user_id, o.status), (0::bigint, o.status)) AS k(user_id, status)
+        GROUP BY k.user_id, k.status
+        ORDER BY k.user_id, k.status
+        ON CONFLICT (user_id, status) DO UPDATE SET count = number_counters.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO number_counters (user_id, status, count)
+        SELECT k.user_id, k.status, SUM(k.delta)
+        FROM (
+            SELECT user_id, status, -1 AS delta FROM old_rows
+            UNION ALL
+            SELECT user_id, status, 1 AS delta FROM new_rows
+        ) d
+        CROSS JOIN LATERAL (VALUES (d.user_id, d.status, d.delta), (0::bigint, d.status, d.delta)) AS k(user_id, status, delta)
+        GROUP BY k.user_id, k.status
+        HAVING SUM(k.delta) <> 0
+        ORDER BY k.user_id, k.status
+        ON CONFLICT (user_id, status) DO UPDATE SET count = number_counters.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS numbers_counters_insert ON numbers;
+DROP TRIGGER IF EXISTS numbers_counters_update ON numbers;
+DROP TRIGGER IF EXISTS numbers_counters_delete ON numbers;
+CREATE TRIGGER numbers_counters_insert AFTER INSERT ON numbers
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_number_counters();
+CREATE TRIGGER numbers_counters_update AFTER UPDATE ON numbers
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_number_counters();
+CREATE TRIGGER numbers_counters_delete AFTER DELETE ON numbers
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_number_counters();
+
+-- Пересчет с нуля; запись в numbers заблокирована до конца миграции
+LOCK TABLE numbers IN SHARE MODE;
+DELETE FROM number_counters;
+INSERT INTO number_counters (user_id, status, count)
+SELECT user_id, status, COUNT(*) FROM numbers GROUP BY user_id, status
+UNION ALL
+SELECT 0, status, COUNT(*) FROM numbers GROUP BY status;
@@ -0,0 +1,19 @@
+-- Статусы хранятся числами (bot/status.py) вместо строк с эмодзи
+ALTER TABLE numbers ALTER COLUMN status TYPE SMALLINT USING CASE status
+    WHEN '🔵 Ожидание' THEN 1
+    WHEN '🟠 Холдинг' THEN 2
+    WHEN '🟢 Успешно' THEN 3
+    WHEN '🔴 Слетел' THEN 4
+END;
+ALTER TABLE numbers_archive ALTER COLUMN status TYPE SMALLINT USING CASE status
+    WHEN '🔵 Ожидание' THEN 1
+    WHEN '🟠 Холдинг' THEN 2
+    WHEN '🟢 Успешно' THEN 3
+    WHEN '🔴 Слетел' THEN 4
+END;
+ALTER TABLE number_counters ALTER COLUMN status TYPE SMALLINT USING CASE status
+    WHEN '🔵 Ожидание' THEN 1
+    WHEN '🟠 Холдинг' THEN 2
+    WHEN '🟢 Успешно' THEN 3
+    WHEN '🔴 Слетел' THEN 4
+END;
@@ -0,0 +1,22 @@
+-- Индексы под горячие запросы database.py; проверка планов — bot/query_plans.py.
+-- Коды статусов — bot/status.py: 1 ожидание, 2 холд, 3 успешно, 4 слетел.
+
+-- expire_holds и get_hold_deadlines ищут холды по hold_end; у старых записей
+-- дедлайн мог храниться только как hold_start + hold_duration
+UPDATE numbers SET hold_end = hold_start + hold_duration
+WHERE status = 2 AND hold_duration IS NOT NULL
+AND hold_end IS DISTINCT FROM hold_start + hold_duration;
+CREATE INDEX IF NOT EXISTS idx_hold_end ON numbers (hold_end) WHERE status = 2;
+
+-- get_list_by_status: постраничный вывод по (timestamp, id) внутри статуса
+CREATE INDEX IF NOT EXISTS idx_waiting_timestamp_id ON numbers (timestamp, id) WHERE status = 1;
+CREATE INDEX IF NOT EXISTS idx_hold_timestamp_id ON numbers (timestamp, id) WHERE status = 2;
+CREATE INDEX IF NOT EXISTS idx_success_timestamp_id ON numbers (timestamp, id) WHERE status = 3;
+CREATE INDEX IF NOT EXISTS idx_failed_timestamp_id ON numbers (timestamp, id) WHERE status = 4;
+DROP INDEX IF EXISTS idx_status_timestamp_id;
+
+-- get_user_numbers
+CREATE INDEX IF NOT EXISTS idx_user_status ON numbers (user_id, status);
+
+-- get_admin_ids
+CREATE INDEX IF NOT EXISTS idx_users_admin ON users (user_id) WHERE is_admin;
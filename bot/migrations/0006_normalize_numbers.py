@@ -0,0 +1,37 @@
+import logging
+from bot.partitions import is_partitioned
+
+logger = logging.getLogger(__name__)
+
+# То же, что normalize_number в bot/utils.py: без пробелов, скобок, дефисов и точек,
+# если остается [+]5-15 цифр. Остальные записи не трогаем
+NORMALIZED = r"""
+    CASE WHEN regexp_replace({0}, '[[:space:]().-]', '', 'g') ~ '^\+?[0-9]{{5,15}}$'
+    THEN regexp_replace({0}, '[[:space:]().-]', '', 'g') ELSE {0} END
+"""
+
+async def upgrade(conn):
+    """
+    Приводит сохраненные номера к виду, в котором их сохраняют /a, /ab
+    и ищут /c, /success, /s, /aa и поиск. Номера, совпавшие после нормализации,
+    сводятся к самой новой записи, как в 0002.
+    В секционированной таблице ключи number_keys нормализуются вместе с номерами.
+    """
+    await conn.execute("LOCK TABLE numbers IN SHARE ROW EXCLUSIVE MODE")
+    deleted = await conn.execute(f"""
+        DELETE FROM numbers a
+        USING numbers b
+        WHERE {NORMALIZED.format('a.number')} = {NORMALIZED.format('b.number')} AND a.id < b.id
+    """)
+    logger.info(f"Duplicate numbers removed: {deleted}")
+    updated = await conn.execute(f"""
+        UPDATE numbers SET number = {NORMALIZED.format('number')}
+        WHERE number <> {NORMALIZED.format('number')}
+    """)
+    logger.info(f"Numbers normalized: {updated}")
+    if await is_partitioned(conn):
+        # Ключи удаленных строк уже сняты триггером release_number_keys
+        await conn.execute(f"""
+            UPDATE number_keys SET number = {NORMALIZED.format('number')}
+            WHERE number <> {NORMALIZED.format('number')}
+        """)
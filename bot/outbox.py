@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError, TelegramAPIError
+
+logger = logging.getLogger(__name__)
+
+# Telegram: около 30 сообщений в секунду всего и около 20 в минуту в одну группу
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", 25))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", 0.33))
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", 3))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+# Сколько ждать после первого уведомления, чтобы собрать соседние в одну сводку
+OUTBOX_DIGEST_WINDOW = float(os.getenv("OUTBOX_DIGEST_WINDOW", 1))
+
+MAX_MESSAGE_LENGTH = 4096
+# Список Redis, через который реплики передают уведомления лидеру
+OUTBOX_KEY = "outbox"
+OUTBOX_POLL_TIMEOUT = 5
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Outbox:
+    """
+    Очередь исходящих сообщений с ограничением скорости.
+    У каждого чата своя очередь и свой обработчик; общий лимит бота
+    и лимит чата соблюдаются через token bucket. При TelegramRetryAfter
+    отправка ждет указанное время, при сетевых ошибках повторяется с backoff.
+    Уведомления с одинаковым digest, накопившиеся в очереди чата,
+    отправляются одним сообщением-сводкой.
+    Лимиты Telegram общие для всех реплик бота, а token bucket живет
+    в процессе, поэтому при заданном redis реплики кладут сообщения
+    в список Redis, а отправляет их только лидер (relay).
+    """
+
+    def __init__(self):
+        self.redis = None
+        self._global = TokenBucket(OUTBOX_GLOBAL_RATE, OUTBOX_GLOBAL_RATE)
+        self._chat_buckets = {}
+        self._queues = {}
+        self._workers = {}
+
+    async def send(self, bot, messages):
+        """
+        Ставит сообщения (chat_id, text, parse_mode, digest) в очередь отправки.
+        digest — заголовок сводки для однотипных уведомлений, которые можно объединить.
+        Если Redis недоступен, сообщения отправляет текущий процесс.
+        """
+        if not messages:
+            return
+        if self.redis is not None:
+            try:
+                await self.redis.rpush(OUTBOX_KEY, *(json.dumps(message) for message in messages))
+                return
+            except Exception as e:
+                logger.error(f"Error passing messages to the leader: {e}")
+        for chat_id, text, parse_mode, digest in messages:
+            self._enqueue(bot, chat_id, text, parse_mode, digest)
+
+    async def relay(self, bot):
+        """
+        Фоновая задача лидера: забирает сообщения всех реплик из Redis
+        и ставит их в очереди чатов этого процесса.
+        """
+        while True:
+            try:
+                item = await self.redis.blpop(OUTBOX_KEY, timeout=OUTBOX_POLL_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+                await asyncio.sleep(OUTBOX_POLL_TIMEOUT)
+                continue
+            if item is None:
+                continue
+            chat_id, text, parse_mode, digest = json.loads(item[1])
+            self._enqueue(bot, chat_id, text, parse_mode, digest)
+
+    def _enqueue(self, bot, chat_id, text, parse_mode, digest):
+        self._queues.setdefault(chat_id, deque()).append((bot, text, parse_mode, digest))
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._work(chat_id))
+
+    async def _work(self, chat_id):
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                bot, text, parse_mode, digest = queue.popleft()
+                if digest is not None:
+                    await asyncio.sleep(OUTBOX_DIGEST_WINDOW)
+                    texts = [text]
+                    rest = deque()
+                    while queue:
+                        item = queue.popleft()
+                        if item[3] == digest and item[2] == parse_mode:
+                            texts.append(item[1])
+                        else:
+                            rest.append(item)
+                    queue.extendleft(reversed(rest))
+                    if len(texts) > 1:
+                        for chunk in self._chunks(f"{digest} ({len(texts)}):", texts):
+                            await self._deliver(bot, chat_id, chunk, parse_mode)
+                        continue
+                await self._deliver(bot, chat_id, text, parse_mode)
+        finally:
+            del self._workers[chat_id]
+            if queue:
+                self._workers[chat_id] = asyncio.create_task(self._work(chat_id))
+            else:
+                del self._queues[chat_id]
+                self._chat_buckets.pop(chat_id, None)
+
+    def _chunks(self, header, texts):
+        chunk = header
+        for text in texts:
+            if len(chunk) + len(text) + 2 > MAX_MESSAGE_LENGTH:
+                yield chunk
+                chunk = text
+            else:
+                chunk += "\n\n" + text
+        yield chunk
+
+    async def _deliver(self, bot, chat_id, text, parse_mode):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST)
+        delay = 1
+        attempt = 0
+        while attempt < OUTBOX_MAX_ATTEMPTS:
+            await bucket.acquire()
+            await self._global.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood limit in chat {chat_id}, retry after {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempt += 1
+                logger.warning(f"Error sending to chat {chat_id} (attempt {attempt}): {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            except TelegramAPIError as e:
+                logger.error(f"Message to chat {chat_id} rejected: {e}")
+                return
+        logger.error(f"Giving up sending to chat {chat_id} after {OUTBOX_MAX_ATTEMPTS} attempts")
+
+outbox = Outbox()
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+from aiogram.types import InlineKeyboardMarkup
+from bot.status import Status, status_key
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", 60))
+
+# Статус для общего списка; его версия меняется при любом изменении номеров
+ALL = "all"
+
+class PageCache:
+    """
+    Кэш отрендеренных страниц списков в Redis.
+    У каждого статуса есть счетчик версии, который функции изменения
+    номеров в database.py увеличивают. Версия входит в ключ страницы,
+    поэтому после изменения старые страницы просто перестают читаться
+    и истекают по TTL. TTL также ограничивает устаревание времени холда.
+    """
+
+    def __init__(self, ttl=PAGE_CACHE_TTL):
+        self.redis = None
+        self.ttl = ttl
+
+    def _version_key(self, status):
+        return f"page_version:{status_key(status)}"
+
+    async def get(self, status, page, cursor):
+        """
+        Возвращает (key, page): key — ключ для сохранения страницы,
+        page — (response, keyboard) из кэша или None.
+        Версия читается до запроса к базе, поэтому страница, собранная
+        во время изменения, сохранится под старой версией и не будет прочитана.
+        """
+        if self.redis is None:
+            return None, None
+        try:
+            version = await self.redis.get(self._version_key(status))
+            version = version.decode() if isinstance(version, bytes) else (version or "0")
+            key = f"page_cache:{status_key(status)}:{version}:{page}:{cursor or ''}"
+            cached = await self.redis.get(key)
+        except Exception as e:
+            logger.error(f"Error reading page cache: {e}")
+            return None, None
+        if cached is None:
+            return key, None
+        data = json.loads(cached)
+        keyboard = InlineKeyboardMarkup.model_validate_json(data['keyboard'])
+        return key, (data['response'], keyboard)
+
+    async def set(self, key, response, keyboard):
+        if self.redis is None or key is None:
+            return
+        data = json.dumps({'response': response, 'keyboard': keyboard.model_dump_json()})
+        try:
+            await self.redis.set(key, data, ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing page cache: {e}")
+
+    async def invalidate(self, *statuses):
+        """
+        Сбрасывает страницы указанных статусов и общего списка.
+        Без аргументов сбрасывает все списки.
+        """
+        if self.redis is None:
+            return
+        statuses = set(statuses or Status)
+        statuses.add(ALL)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for status in statuses:
+                    pipe.incr(self._version_key(status))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error invalidating page cache: {e}")
+
+page_cache = PageCache()
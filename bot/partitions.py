@@ -0,0 +1,200 @@
+import logging
+import os
+import asyncpg
+from datetime import datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
+
+NUMBERS_PARTITIONED = os.getenv("NUMBERS_PARTITIONED", "false").lower() in ("1", "true", "yes")
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", 3))
+PARTITION_PREFIX = "numbers_p"
+PARTITION_SPAN = timedelta(days=1)
+# Сколько ждать блокировку numbers перед удалением секции; пока DROP ждет, ждут и все запросы к numbers
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "2s")
+
+def partition_name(day):
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+def partition_day(name):
+    """
+    Начало суток, которые покрывает секция; None для секций не по шаблону (default).
+    """
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def day_start(moment):
+    return moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+async def is_partitioned(conn):
+    return bool(await conn.fetchval("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('numbers')"))
+
+async def partition_numbers(conn, ahead=PARTITIONS_AHEAD):
+    """
+    Переводит numbers в таблицу, секционированную по суткам timestamp, вместе с данными.
+    Колонки, индексы, внешние ключи и триггеры берутся из текущей схемы,
+    поэтому перевод возможен на любой версии миграций.
+    Уникальный индекс секционированной таблицы обязан включать timestamp,
+    поэтому уникальность номера держит отдельная таблица number_keys:
+    вставка в numbers идет через нее, а удаление освобождает ключ триггером.
+    Возвращает False, если таблица уже секционирована.
+    """
+    async with conn.transaction():
+        if await is_partitioned(conn):
+            return False
+        await conn.execute("LOCK TABLE numbers IN ACCESS EXCLUSIVE MODE")
+        indexes = await conn.fetch("""
+            SELECT indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = 'numbers'
+        """)
+        triggers = await conn.fetch("""
+            SELECT pg_get_triggerdef(oid) AS triggerdef FROM pg_trigger
+            WHERE tgrelid = 'numbers'::regclass AND NOT tgisinternal
+        """)
+        foreign_keys = await conn.fetch("""
+            SELECT conname, pg_get_constraintdef(oid) AS condef FROM pg_constraint
+            WHERE conrelid = 'numbers'::regclass AND contype = 'f'
+        """)
+        oldest = await conn.fetchval("SELECT MIN(timestamp) FROM numbers")
+
+        await conn.execute("ALTER TABLE numbers RENAME TO numbers_legacy")
+        await conn.execute("""
+            CREATE TABLE numbers (LIKE numbers_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (timestamp)
+        """)
+        # Последовательность id переходит к новой таблице и не удаляется вместе со старой
+        await conn.execute("ALTER SEQUENCE IF EXISTS numbers_id_seq OWNED BY numbers.id")
+        await conn.execute("CREATE TABLE numbers_default PARTITION OF numbers DEFAULT")
+        await ensure_partitions(conn, start=oldest, ahead=ahead)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS number_keys (
+                number TEXT PRIMARY KEY,
+                timestamp TIMESTAMPTZ NOT NULL
+            )
+        """)
+        # Триггеры на новую таблицу еще не навешены: счетчики не меняются, данные те же
+        await conn.execute("""
+            INSERT INTO numbers
+            SELECT DISTINCT ON (number) * FROM numbers_legacy
+            ORDER BY number, id DESC
+        """)
+        await conn.execute("""
+            INSERT INTO number_keys (number, timestamp)
+            SELECT number, timestamp FROM numbers
+            ON CONFLICT (number) DO NOTHING
+        """)
+        await conn.execute("DROP TABLE numbers_legacy")
+
+        await conn.execute("ALTER TABLE numbers ADD PRIMARY KEY (id, timestamp)")
+        for record in foreign_keys:
+            await conn.execute(f"ALTER TABLE numbers ADD CONSTRAINT {record['conname']} {record['condef']}")
+        for record in indexes:
+            # Первичный ключ и уникальный индекс номера заменены выше
+            if record['indexdef'].startswith("CREATE UNIQUE INDEX"):
+                continue
+            await conn.execute(record['indexdef'])
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_number ON numbers (number)")
+        for record in triggers:
+            await conn.execute(record['triggerdef'])
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION release_number_keys() RETURNS trigger AS $$
+            BEGIN
+                DELETE FROM number_keys k USING old_rows o
+                WHERE k.number = o.number AND k.timestamp = o.timestamp;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        await conn.execute("""
+            CREATE TRIGGER numbers_keys_delete AFTER DELETE ON numbers
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION release_number_keys()
+        """)
+    logger.info("Numbers table converted to daily partitions.")
+    return True
+
+async def ensure_partitions(conn, start=None, ahead=PARTITIONS_AHEAD):
+    """
+    Создает суточные секции от start (по умолчанию — сегодня) на ahead дней вперед.
+    """
+    today = day_start(datetime.now(timezone.utc))
+    day = day_start(start) if start is not None else today
+    created = 0
+    while day <= today + ahead * PARTITION_SPAN:
+        name = partition_name(day)
+        exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+        if not exists:
+            await conn.execute(f"""
+                CREATE TABLE {name} PARTITION OF numbers
+                FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + PARTITION_SPAN).isoformat()}')
+            """)
+            created += 1
+        day += PARTITION_SPAN
+    if created:
+        logger.info(f"Number partitions created: {created}")
+    return created
+
+async def drop_expired_partitions(conn, expiration_time, archive=False):
+    """
+    Удаляет секции, все строки которых старше expiration_time.
+    DROP не вызывает триггеры, поэтому счетчики и ключи номеров
+    правятся в той же транзакции. Возвращает количество удаленных строк.
+    Блокировки берутся в том же порядке, что и у обычных запросов:
+    сначала numbers, потом секция. Если numbers занята дольше
+    PARTITION_LOCK_TIMEOUT, удаление откладывается до следующего прогона,
+    а строки секции удалит построчная очистка.
+    """
+    names = await conn.fetch("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'numbers'::regclass
+    """)
+    deleted = 0
+    for name in sorted(record['relname'] for record in names):
+        day = partition_day(name)
+        if day is None or day + PARTITION_SPAN > expiration_time:
+            continue
+        try:
+            async with conn.transaction():
+                await conn.execute("SELECT set_config('lock_timeout', $1, true)", PARTITION_LOCK_TIMEOUT)
+                await conn.execute("LOCK TABLE ONLY numbers IN ACCESS EXCLUSIVE MODE")
+                await conn.execute(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE")
+                rows = await drop_partition(conn, name, archive)
+        except asyncpg.exceptions.LockNotAvailableError:
+            logger.warning(f"Partition {name} is in use, drop postponed.")
+            break
+        deleted += rows
+        logger.info(f"Partition {name} dropped ({rows} rows).")
+    return deleted
+
+async def drop_partition(conn, name, archive):
+    """
+    Удаляет секцию вместе с ее вкладом в счетчики и ключи номеров.
+    Вызывается в транзакции, где numbers и секция уже заблокированы.
+    """
+    from bot.database import ALL_USERS
+    rows = await conn.fetchval(f"SELECT COUNT(*) FROM {name}")
+    if archive:
+        await conn.execute(f"""
+            INSERT INTO numbers_archive (id, number, user_id, status, timestamp, hold_time)
+            SELECT id, number, user_id, status, timestamp, hold_time FROM {name}
+            ON CONFLICT (id) DO NOTHING
+        """)
+    await conn.execute(f"""
+        INSERT INTO number_counters (user_id, status, count)
+        SELECT k.user_id, k.status, -COUNT(*)
+        FROM {name} o
+        CROSS JOIN LATERAL (VALUES (o.user_id, o.status), ($1::bigint, o.status)) AS k(user_id, status)
+        GROUP BY k.user_id, k.status
+        ORDER BY k.user_id, k.status
+        ON CONFLICT (user_id, status) DO UPDATE SET count = number_counters.count + EXCLUDED.count
+    """, ALL_USERS)
+    await conn.execute(f"""
+        DELETE FROM number_keys k USING {name} o
+        WHERE k.number = o.number AND k.timestamp = o.timestamp
+    """)
+    await conn.execute(f"DROP TABLE {name}")
+    return rows
@@ -0,0 +1,253 @@
+# SQL-запросы database.py. Вынесены в модуль, чтобы bot/query_plans.py
+# проверял планы именно тех запросов, которые выполняет бот.
+from bot.status import Status
+
+# Статус в запросах списков и холдов подставляется литералом: общий план
+# подготовленного запроса с параметром вместо статуса не может использовать
+# частичные индексы статуса (миграция 0005)
+
+ALL_RECORDS_FIRST = """
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration
+    FROM numbers
+    ORDER BY id
+    LIMIT $1
+"""
+
+ALL_RECORDS_AFTER = """
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration
+    FROM numbers
+    WHERE id > $1
+    ORDER BY id
+    LIMIT $2
+"""
+
+ALL_RECORDS_BEFORE = """
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration
+    FROM numbers
+    WHERE id < $1
+    ORDER BY id DESC
+    LIMIT $2
+"""
+
+LIST_BY_STATUS_FIRST = {status: f"""
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_duration
+    FROM numbers
+    WHERE status = {status:d}
+    ORDER BY timestamp ASC, id ASC
+    LIMIT $1
+""" for status in Status}
+
+LIST_BY_STATUS_AFTER = {status: f"""
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_duration
+    FROM numbers
+    WHERE status = {status:d} AND (timestamp, id) > ($1, $2)
+    ORDER BY timestamp ASC, id ASC
+    LIMIT $3
+""" for status in Status}
+
+LIST_BY_STATUS_BEFORE = {status: f"""
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_duration
+    FROM numbers
+    WHERE status = {status:d} AND (timestamp, id) < ($1, $2)
+    ORDER BY timestamp DESC, id DESC
+    LIMIT $3
+""" for status in Status}
+
+FIND_BY_NUMBER = """
+    SELECT id, number, user_id, status, timestamp, hold_start, hold_end, hold_duration
+    FROM numbers
+    WHERE number = $1
+"""
+
+USER_NUMBERS = """
+    SELECT id, number, status, timestamp, hold_start, hold_end, hold_duration
+    FROM numbers
+    WHERE user_id = $1
+"""
+
+USER_NUMBERS_BY_STATUS = """
+    SELECT id, number, status, timestamp, hold_start, hold_end, hold_duration
+    FROM numbers
+    WHERE user_id = $1 AND status = $2
+"""
+
+COUNT_BY_USER = "SELECT SUM(count) FROM number_counters WHERE user_id = $1"
+
+COUNT_BY_USER_STATUS = "SELECT count FROM number_counters WHERE user_id = $1 AND status = $2"
+
+COUNTS_BY_USER = "SELECT status, count FROM number_counters WHERE user_id = $1"
+
+ADD_WAITING = """
+    INSERT INTO numbers (number, user_id, status, timestamp, chat_id)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (number) DO NOTHING
+    RETURNING id
+"""
+
+ADD_WAITING_PARTITIONED = """
+    WITH key AS (
+        INSERT INTO number_keys (number, timestamp) VALUES ($1, $4)
+        ON CONFLICT (number) DO NOTHING
+        RETURNING number, timestamp
+    )
+    INSERT INTO numbers (number, user_id, status, timestamp, chat_id)
+    SELECT number, $2::bigint, $3::smallint, timestamp, $5::bigint FROM key
+    RETURNING id
+"""
+
+CREATE_INTAKE = "CREATE TEMP TABLE numbers_intake (number TEXT NOT NULL) ON COMMIT DROP"
+
+ADD_MANY_WAITING = """
+    WITH inserted AS (
+        INSERT INTO numbers (number, user_id, status, timestamp, chat_id)
+        SELECT DISTINCT number, $1::bigint, $2::smallint, $3::timestamptz, $4::bigint FROM numbers_intake
+        ON CONFLICT (number) DO NOTHING
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM inserted
+"""
+
+ADD_MANY_WAITING_PARTITIONED = """
+    WITH keys AS (
+        INSERT INTO number_keys (number, timestamp)
+        SELECT DISTINCT number, $3::timestamptz FROM numbers_intake
+        ON CONFLICT (number) DO NOTHING
+        RETURNING number, timestamp
+    ), inserted AS (
+        INSERT INTO numbers (number, user_id, status, timestamp, chat_id)
+        SELECT number, $1::bigint, $2::smallint, timestamp, $4::bigint FROM keys
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM inserted
+"""
+
+MOVE_TO_HOLD = """
+    UPDATE numbers
+    SET status = $2, hold_start = now(), hold_end = now() + $3::interval, hold_duration = $3, hold_set_by = $4, chat_id = $5
+    WHERE number = $1 AND status = $6
+    RETURNING hold_end
+"""
+
+MOVE_MANY_TO_HOLD = """
+    UPDATE numbers
+    SET status = $2, hold_start = now(), hold_end = now() + $3::interval, hold_duration = $3, hold_set_by = $4, chat_id = $5
+    WHERE number = ANY($1::text[]) AND status = $6
+    RETURNING number, hold_end
+"""
+
+MARK_SUCCESSFUL = """
+    UPDATE numbers
+    SET status = $2, hold_end = now(), hold_time = now() - hold_start
+    WHERE number = $1 AND status = $3
+    RETURNING user_id, hold_set_by, hold_time, chat_id
+"""
+
+MARK_MANY_SUCCESSFUL = """
+    UPDATE numbers
+    SET status = $2, hold_end = now(), hold_time = now() - hold_start
+    WHERE number = ANY($1::text[]) AND status = $3
+    RETURNING number, user_id, hold_set_by, hold_time, chat_id
+"""
+
+MARK_FAILED = """
+    UPDATE numbers
+    SET status = $2, hold_time = now() - hold_start
+    WHERE number = $1 AND status = $3
+    RETURNING id
+"""
+
+MARK_MANY_FAILED = """
+    UPDATE numbers
+    SET status = $2, hold_time = now() - hold_start
+    WHERE number = ANY($1::text[]) AND status = $3
+    RETURNING number
+"""
+
+EXPIRE_HOLDS = f"""
+    UPDATE numbers
+    SET status = $2, hold_end = $1, hold_time = $1 - hold_start
+    WHERE status = {Status.HOLD:d}
+    AND hold_end <= $1
+    RETURNING id, number, user_id, hold_set_by, chat_id, hold_time
+"""
+
+HOLD_DEADLINES = f"""
+    SELECT number, hold_end AS deadline
+    FROM numbers
+    WHERE status = {Status.HOLD:d}
+    AND hold_end IS NOT NULL
+"""
+
+DELETE_NUMBER = """
+    DELETE FROM numbers WHERE number = $1
+    RETURNING status
+"""
+
+CLEAR_NUMBERS = "DELETE FROM numbers"
+
+DELETE_EXPIRED_BATCH = """
+    WITH expired AS (
+        SELECT id FROM numbers
+        WHERE timestamp < $1
+        ORDER BY timestamp
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM numbers n USING expired e
+    WHERE n.id = e.id
+"""
+
+ARCHIVE_EXPIRED_BATCH = """
+    WITH expired AS (
+        SELECT id FROM numbers
+        WHERE timestamp < $1
+        ORDER BY timestamp
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    ), deleted AS (
+        DELETE FROM numbers n USING expired e
+        WHERE n.id = e.id
+        RETURNING n.id, n.number, n.user_id, n.status, n.timestamp, n.hold_time
+    ), archived AS (
+        INSERT INTO numbers_archive (id, number, user_id, status, timestamp, hold_time)
+        SELECT id, number, user_id, status, timestamp, hold_time FROM deleted
+        ON CONFLICT (id) DO NOTHING
+    )
+    SELECT COUNT(*) FROM deleted
+"""
+
+OLDEST_EXPIRED = "SELECT MIN(timestamp) FROM numbers WHERE timestamp < $1"
+
+CLEAR_COUNTERS = "DELETE FROM number_counters"
+
+REBUILD_COUNTERS = """
+    INSERT INTO number_counters (user_id, status, count)
+    SELECT user_id, status, COUNT(*) FROM numbers GROUP BY user_id, status
+    UNION ALL
+    SELECT $1, status, COUNT(*) FROM numbers GROUP BY status
+"""
+
+ADMIN_EXISTS = """
+    SELECT EXISTS (
+        SELECT 1 FROM users WHERE is_admin = TRUE
+    )
+"""
+
+SET_USER_ADMIN = """
+    INSERT INTO users (user_id, is_admin)
+    VALUES ($1, $2)
+    ON CONFLICT (user_id) DO UPDATE SET is_admin = $2
+"""
+
+ADMIN_IDS = "SELECT user_id FROM users WHERE is_admin = TRUE"
+
+SAVE_USER_NAMES = """
+    INSERT INTO users (user_id, full_name)
+    SELECT * FROM unnest($1::bigint[], $2::text[])
+    ON CONFLICT (user_id) DO UPDATE SET full_name = EXCLUDED.full_name
+"""
+
+USER_NAMES = """
+    SELECT user_id, full_name FROM users
+    WHERE user_id = ANY($1::bigint[]) AND full_name IS NOT NULL
+"""
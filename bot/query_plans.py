@@ -0,0 +1,121 @@
+import json
+import logging
+from datetime import datetime, timezone, timedelta
+from bot import queries
+from bot.status import Status
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_NUMBER = "0"
+SAMPLE_USER = 0
+
+def hot_queries(partitioned=False):
+    """
+    Все запросы database.py в виде (название, SQL, параметры, full_scan).
+    SQL берется из bot/queries.py, тот же, что выполняет бот.
+    full_scan отмечает запросы, которые читают таблицу целиком по смыслу
+    (очистка, пересчет счетчиков); их план показывается, но не проверяется.
+    """
+    now = datetime.now(timezone.utc)
+    hold = timedelta(hours=1)
+    checks = [
+        ("get_all_records", queries.ALL_RECORDS_FIRST, [10], False),
+        ("get_all_records (after)", queries.ALL_RECORDS_AFTER, [1, 10], False),
+        ("get_all_records (before)", queries.ALL_RECORDS_BEFORE, [1, 10], False),
+    ]
+    for status in Status:
+        checks += [
+            (f"get_list_by_status {status.name}", queries.LIST_BY_STATUS_FIRST[status], [10], False),
+            (f"get_list_by_status {status.name} (after)", queries.LIST_BY_STATUS_AFTER[status], [now, 1, 10], False),
+            (f"get_list_by_status {status.name} (before)", queries.LIST_BY_STATUS_BEFORE[status], [now, 1, 10], False),
+        ]
+    if partitioned:
+        add_waiting = ("add_to_waiting", queries.ADD_WAITING_PARTITIONED,
+                       [SAMPLE_NUMBER, SAMPLE_USER, Status.WAITING, now, SAMPLE_USER], False)
+        add_many = ("add_many_to_waiting", queries.ADD_MANY_WAITING_PARTITIONED,
+                    [SAMPLE_USER, Status.WAITING, now, SAMPLE_USER], False)
+    else:
+        add_waiting = ("add_to_waiting", queries.ADD_WAITING,
+                       [SAMPLE_NUMBER, SAMPLE_USER, Status.WAITING, now, SAMPLE_USER], False)
+        add_many = ("add_many_to_waiting", queries.ADD_MANY_WAITING,
+                    [SAMPLE_USER, Status.WAITING, now, SAMPLE_USER], False)
+    checks += [
+        ("find_record_by_number", queries.FIND_BY_NUMBER, [SAMPLE_NUMBER], False),
+        ("get_user_numbers", queries.USER_NUMBERS, [SAMPLE_USER], False),
+        ("get_user_numbers (status)", queries.USER_NUMBERS_BY_STATUS, [SAMPLE_USER, Status.WAITING], False),
+        ("count_records", queries.COUNT_BY_USER, [SAMPLE_USER], False),
+        ("count_records (status)", queries.COUNT_BY_USER_STATUS, [SAMPLE_USER, Status.WAITING], False),
+        ("count_by_status", queries.COUNTS_BY_USER, [SAMPLE_USER], False),
+        add_waiting,
+        add_many,
+        ("move_to_hold", queries.MOVE_TO_HOLD,
+         [SAMPLE_NUMBER, Status.HOLD, hold, SAMPLE_USER, SAMPLE_USER, Status.WAITING], False),
+        ("move_many_to_hold", queries.MOVE_MANY_TO_HOLD,
+         [[SAMPLE_NUMBER], Status.HOLD, hold, SAMPLE_USER, SAMPLE_USER, Status.WAITING], False),
+        ("mark_as_successful", queries.MARK_SUCCESSFUL, [SAMPLE_NUMBER, Status.SUCCESS, Status.HOLD], False),
+        ("mark_many_as_successful", queries.MARK_MANY_SUCCESSFUL,
+         [[SAMPLE_NUMBER], Status.SUCCESS, Status.HOLD], False),
+        ("mark_as_failed", queries.MARK_FAILED, [SAMPLE_NUMBER, Status.FAILED, Status.HOLD], False),
+        ("mark_many_as_failed", queries.MARK_MANY_FAILED, [[SAMPLE_NUMBER], Status.FAILED, Status.HOLD], False),
+        ("expire_holds", queries.EXPIRE_HOLDS, [now, Status.SUCCESS], False),
+        ("get_hold_deadlines", queries.HOLD_DEADLINES, [], False),
+        ("delete_number", queries.DELETE_NUMBER, [SAMPLE_NUMBER], False),
+        ("delete_expired_batch", queries.DELETE_EXPIRED_BATCH, [now, 1000], False),
+        ("delete_expired_batch (archive)", queries.ARCHIVE_EXPIRED_BATCH, [now, 1000], False),
+        ("delete_expired_records (lag)", queries.OLDEST_EXPIRED, [now], False),
+        ("add_first_admin", queries.ADMIN_EXISTS, [], False),
+        ("set_user_admin", queries.SET_USER_ADMIN, [SAMPLE_USER, False], False),
+        ("get_admin_ids", queries.ADMIN_IDS, [], False),
+        ("save_user_names", queries.SAVE_USER_NAMES, [[SAMPLE_USER], [""]], False),
+        ("get_user_names", queries.USER_NAMES, [[SAMPLE_USER]], False),
+        ("clear_all", queries.CLEAR_NUMBERS, [], True),
+        ("rebuild_counters (clear)", queries.CLEAR_COUNTERS, [], True),
+        ("rebuild_counters", queries.REBUILD_COUNTERS, [SAMPLE_USER], True),
+    ]
+    return checks
+
+def plan_scans(plan):
+    """
+    Узлы плана, читающие таблицы: список (тип узла, таблица или индекс).
+    """
+    scans = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        node_type = node["Node Type"]
+        # Bitmap Heap Scan читает таблицу по дочернему Bitmap Index Scan
+        if "Index Name" in node:
+            scans.append((node_type, node["Index Name"]))
+        elif node_type.endswith("Scan") and node_type != "Bitmap Heap Scan" and "Relation Name" in node:
+            scans.append((node_type, node["Relation Name"]))
+        stack.extend(node.get("Plans", []))
+    return scans
+
+async def check_query_plans(conn, partitioned=False):
+    """
+    Выполняет EXPLAIN для запросов из hot_queries() и проверяет, что каждый
+    читает таблицы только через индексы. Последовательное сканирование на время
+    проверки запрещено (enable_seqscan = off): на маленькой таблице планировщик
+    честно предпочел бы его, а проверка должна показать, что подходящий индекс
+    существует и применим. Временная таблица numbers_intake всегда читается
+    целиком. Возвращает список (название, ok, узлы чтения).
+    """
+    results = []
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        await conn.execute("SET LOCAL enable_seqscan = off")
+        await conn.execute(queries.CREATE_INTAKE)
+        for name, query, args, full_scan in hot_queries(partitioned):
+            explained = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+            scans = plan_scans(json.loads(explained)[0]["Plan"])
+            ok = full_scan or all(
+                node_type != "Seq Scan" or target == "numbers_intake" for node_type, target in scans
+            )
+            if not ok:
+                logger.warning(f"Query {name} does not use an index: {scans}")
+            results.append((name, ok, scans))
+    finally:
+        # EXPLAIN ничего не меняет, но numbers_intake и настройку убираем откатом
+        await transaction.rollback()
+    return results
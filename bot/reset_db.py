@@ -3,6 +3,7 @@ import asyncpg
 import logging
 from dotenv import load_dotenv
 import os
+from bot.migrate import migrate
 
 load_dotenv()
 
@@ -15,20 +16,19 @@ DB_NAME = os.getenv("DB_NAME")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def reset_database():
-    conn = await asyncpg.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
-    await conn.execute("DROP TABLE IF EXISTS users CASCADE")
+async def reset_database(conn):
     await conn.execute("DROP TABLE IF EXISTS numbers CASCADE")
-    await conn.close()
+    await conn.execute("DROP TABLE IF EXISTS users CASCADE")
+    for table in ("numbers_archive", "number_counters", "number_keys", "schema_version"):
+        await conn.execute(f"DROP TABLE IF EXISTS {table}")
     logger.warning("Database tables dropped.")
 
-async def init_db():
+async def init_db(conn):
+    # Схема создается теми же миграциями, что и при запуске бота
+    await migrate(conn)
+    logger.info("Database tables recreated.")
+
+async def main():
     conn = await asyncpg.connect(
         host=DB_HOST,
         port=DB_PORT,
@@ -36,32 +36,11 @@ async def init_db():
         password=DB_PASSWORD,
         database=DB_NAME
     )
-    await conn.execute(""" 
-        CREATE TABLE users (
-            user_id BIGINT PRIMARY KEY,
-            is_admin BOOLEAN NOT NULL DEFAULT FALSE
-        )
-    """)
-    await conn.execute(""" 
-        CREATE TABLE numbers (
-            id SERIAL PRIMARY KEY,
-            number TEXT NOT NULL,
-            user_id BIGINT NOT NULL,
-            status TEXT NOT NULL,
-            timestamp TIMESTAMPTZ NOT NULL,
-            hold_start TIMESTAMPTZ,
-            hold_end TIMESTAMPTZ,
-            hold_duration INTERVAL
-        )
-    """)
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON numbers (status)")
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON numbers (timestamp)")
-    await conn.close()
-    logger.info("Database tables recreated.")
-
-async def main():
-    await reset_database()
-    await init_db()
+    try:
+        await reset_database(conn)
+        await init_db(conn)
+    finally:
+        await conn.close()
 
 if __name__ == "__main__":
     import asyncio
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import json
+import logging
+from datetime import datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = timedelta(seconds=60)
+SCHEDULE_CHANNEL = "hold_schedule"
+
+class HoldScheduler:
+    """
+    Планировщик окончания холдов.
+    Хранит ближайшие дедлайны в min-heap и спит ровно до ближайшего из них.
+    Отмененные холды удаляются лениво: запись в куче пропускается,
+    если дедлайн номера изменился или номер больше не в холде.
+    Расписание ведет только реплика-лидер (active); остальные реплики
+    пересылают ей новые дедлайны через Redis pub/sub.
+    """
+
+    def __init__(self):
+        self.redis = None
+        self.active = False
+        self._heap = []
+        self._deadlines = {}
+        self._wakeup = asyncio.Event()
+        self._publishing = set()
+
+    def load(self, records):
+        """
+        Заполняет расписание из записей (number, deadline).
+        Дедлайны, добавленные во время загрузки, сохраняются.
+        """
+        deadlines = {record['number']: record['deadline'] for record in records}
+        deadlines.update(self._deadlines)
+        self._deadlines = deadlines
+        self._heap = [(deadline, number) for number, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def schedule(self, number, deadline):
+        if deadline is None:
+            self.cancel(number)
+            return
+        if not self.active:
+            self._forward(number, deadline)
+            return
+        self._deadlines[number] = deadline
+        heapq.heappush(self._heap, (deadline, number))
+        self._wakeup.set()
+
+    def cancel(self, number):
+        self._deadlines.pop(number, None)
+
+    def clear(self):
+        self._deadlines.clear()
+        self._heap.clear()
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _forward(self, number, deadline):
+        if self.redis is None:
+            return
+        message = json.dumps({'number': number, 'deadline': deadline.isoformat()})
+        task = asyncio.ensure_future(self.redis.publish(SCHEDULE_CHANNEL, message))
+        self._publishing.add(task)
+        task.add_done_callback(self._published)
+
+    def _published(self, task):
+        self._publishing.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error forwarding hold deadline: {task.exception()}")
+
+    async def _listen(self, pubsub):
+        async for message in pubsub.listen():
+            if message['type'] != 'message':
+                continue
+            data = json.loads(message['data'])
+            self.schedule(data['number'], datetime.fromisoformat(data['deadline']))
+
+    def next_deadline(self):
+        while self._heap:
+            deadline, number = self._heap[0]
+            if self._deadlines.get(number) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, number = heapq.heappop(self._heap)
+            if self._deadlines.get(number) == deadline:
+                del self._deadlines[number]
+                due.append(number)
+        return due
+
+    async def run_leader(self, load, on_due):
+        """
+        Запускается на реплике-лидере: подписывается на дедлайны других реплик,
+        восстанавливает расписание из базы через load() и обрабатывает холды.
+        Подписка оформляется до загрузки, чтобы не пропустить дедлайны между ними.
+        """
+        pubsub = self.redis.pubsub() if self.redis is not None else None
+        listener = None
+        try:
+            if pubsub is not None:
+                await pubsub.subscribe(SCHEDULE_CHANNEL)
+            self.active = True
+            self.load(await load())
+            if pubsub is not None:
+                listener = asyncio.create_task(self._listen(pubsub))
+            await on_due(datetime.now(timezone.utc))
+            await self.run(on_due)
+        finally:
+            self.active = False
+            self.clear()
+            if listener is not None:
+                listener.cancel()
+            if pubsub is not None:
+                await pubsub.reset()
+
+    async def run(self, on_due):
+        """
+        Основной цикл: ждет ближайший дедлайн или изменение расписания
+        и вызывает on_due(now), когда срок хотя бы одного холда истек.
+        """
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+            timeout = None
+            if deadline is not None:
+                now = datetime.now(timezone.utc)
+                if deadline <= now:
+                    due = self._pop_due(now)
+                    try:
+                        await on_due(now)
+                    except Exception as e:
+                        logger.error(f"Error completing holds: {e}")
+                        # Повторяем попытку позже, чтобы не потерять холды
+                        for number in due:
+                            self.schedule(number, now + RETRY_DELAY)
+                    continue
+                timeout = (deadline - now).total_seconds()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+hold_scheduler = HoldScheduler()
@@ -0,0 +1,28 @@
+from enum import IntEnum
+
+class Status(IntEnum):
+    """
+    Статус номера. В базе хранится как smallint, в callback data — числом.
+    """
+    WAITING = 1
+    HOLD = 2
+    SUCCESS = 3
+    FAILED = 4
+
+    @property
+    def label(self):
+        return STATUS_LABELS[self]
+
+STATUS_LABELS = {
+    Status.WAITING: "🔵 Ожидание",
+    Status.HOLD: "🟠 Холдинг",
+    Status.SUCCESS: "🟢 Успешно",
+    Status.FAILED: "🔴 Слетел",
+}
+
+def status_key(status):
+    """
+    Статус для callback data и ключей кэша: код числом, строки ("all") как есть.
+    f"{status}" дает у IntEnum число только начиная с Python 3.11.
+    """
+    return status if isinstance(status, str) else f"{status:d}"
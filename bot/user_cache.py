@@ -0,0 +1,167 @@
+import asyncio
+import html
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 3600))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 2048))
+USER_LOOKUP_CONCURRENCY = int(os.getenv("USER_LOOKUP_CONCURRENCY", 10))
+USER_FLUSH_INTERVAL = int(os.getenv("USER_FLUSH_INTERVAL", 5))
+
+NOT_FOUND_TAG = "Пользователь не найден"
+
+def format_user_tag(user_id, full_name):
+    if full_name is None:
+        return NOT_FOUND_TAG
+    return f"<a href='tg://user?id={user_id}'>{html.escape(full_name)}</a>"
+
+class UserCache:
+    """
+    Справочник имен пользователей Telegram.
+    Имена записываются из входящих апдейтов (см. UserDirectoryMiddleware)
+    и пачками сохраняются в таблицу users.
+    Поиск идет по уровням: LRU в памяти процесса с TTL, общий Redis,
+    таблица users. В Telegram через bot.get_chat уходят только те
+    пользователи, которых бот еще ни разу не видел, — одной волной
+    параллельных запросов с ограничением одновременных вызовов.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, maxsize=USER_CACHE_SIZE, concurrency=USER_LOOKUP_CONCURRENCY):
+        self.redis = None
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = OrderedDict()
+        self._pending = {}
+        self._unsaved = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _key(self, user_id):
+        return f"user_name:{user_id}"
+
+    def _get_local(self, user_id):
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        full_name, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._local[user_id]
+            return None
+        self._local.move_to_end(user_id)
+        return full_name
+
+    def _set_local(self, user_id, full_name):
+        self._local[user_id] = (full_name, time.monotonic() + self.ttl)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    async def set(self, user_id, full_name):
+        self._set_local(user_id, full_name)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._key(user_id), full_name, ex=self.ttl)
+            except Exception as e:
+                logger.error(f"Error caching user {user_id}: {e}")
+
+    async def record(self, user_id, full_name):
+        """
+        Запоминает имя пользователя из апдейта.
+        Запись в базу откладывается до следующего flush.
+        """
+        if self._get_local(user_id) == full_name:
+            return
+        self._unsaved[user_id] = full_name
+        await self.set(user_id, full_name)
+
+    async def flush(self):
+        if not self._unsaved:
+            return
+        from bot.database import save_user_names
+        names, self._unsaved = self._unsaved, {}
+        try:
+            await save_user_names(names)
+        except Exception as e:
+            logger.error(f"Error saving user names: {e}")
+            # Не теряем имена, пришедшие до ошибки
+            self._unsaved = {**names, **self._unsaved}
+
+    async def run(self, interval=USER_FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def _fetch(self, bot, user_id):
+        async with self._semaphore:
+            try:
+                user = await bot.get_chat(user_id)
+            except Exception as e:
+                logger.error(f"Error fetching user {user_id}: {e}")
+                return None
+        await self.record(user_id, user.full_name)
+        return user.full_name
+
+    async def get_names(self, bot, user_ids):
+        """
+        Возвращает словарь {user_id: full_name}; для ненайденных — None.
+        """
+        names = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            full_name = self._get_local(user_id)
+            if full_name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = full_name
+
+        if missing and self.redis is not None:
+            try:
+                values = await self.redis.mget([self._key(user_id) for user_id in missing])
+            except Exception as e:
+                logger.error(f"Error reading user cache: {e}")
+                values = [None] * len(missing)
+            still_missing = []
+            for user_id, value in zip(missing, values):
+                if value is None:
+                    still_missing.append(user_id)
+                    continue
+                full_name = value.decode() if isinstance(value, bytes) else value
+                self._set_local(user_id, full_name)
+                names[user_id] = full_name
+            missing = still_missing
+
+        if missing:
+            from bot.database import get_user_names
+            try:
+                stored = await get_user_names(missing)
+            except Exception as e:
+                logger.error(f"Error reading user names: {e}")
+                stored = {}
+            for user_id, full_name in stored.items():
+                await self.set(user_id, full_name)
+                names[user_id] = full_name
+            missing = [user_id for user_id in missing if user_id not in stored]
+
+        if missing:
+            # Одинаковые запросы из параллельных обработчиков объединяются
+            tasks = []
+            for user_id in missing:
+                task = self._pending.get(user_id)
+                if task is None:
+                    task = asyncio.ensure_future(self._fetch(bot, user_id))
+                    self._pending[user_id] = task
+                    task.add_done_callback(lambda _, user_id=user_id: self._pending.pop(user_id, None))
+                tasks.append(task)
+            results = await asyncio.gather(*tasks)
+            names.update(zip(missing, results))
+
+        return names
+
+    async def get_tags(self, bot, user_ids):
+        names = await self.get_names(bot, user_ids)
+        return {user_id: format_user_tag(user_id, full_name) for user_id, full_name in names.items()}
+
+user_cache = UserCache()
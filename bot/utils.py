@@ -1,5 +1,11 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from datetime import datetime, timezone, timedelta
 import pytz
+import re
+from bot.status import Status, status_key
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
 
 def convert_utc_to_msk(utc_time):
     """
@@ -8,11 +14,40 @@ def convert_utc_to_msk(utc_time):
     msk_timezone = pytz.timezone('Europe/Moscow')
     return utc_time.astimezone(msk_timezone)
 
+def _to_base36(value):
+    digits = ""
+    while True:
+        value, remainder = divmod(value, 36)
+        digits = BASE36_DIGITS[remainder] + digits
+        if value == 0:
+            return digits
+
+def encode_cursor(record):
+    """
+    Кодирует позицию записи (timestamp, id) в короткую строку для callback data.
+    """
+    micros = (record['timestamp'] - EPOCH) // timedelta(microseconds=1)
+    return f"{_to_base36(micros)}_{_to_base36(record['id'])}"
+
+def decode_cursor(cursor):
+    micros, record_id = cursor.split("_")
+    return EPOCH + timedelta(microseconds=int(micros, 36)), int(record_id, 36)
+
+def encode_id_cursor(record):
+    return _to_base36(record['id'])
+
+def decode_id_cursor(cursor):
+    return int(cursor, 36)
+
 # utils.py
-def build_pagination_keyboard(current_page, total_pages, status=None):
+def build_pagination_keyboard(current_page, total_pages, status=None, first_cursor=None, last_cursor=None):
+    """
+    Кнопки навигации. Если переданы курсоры первой и последней записи страницы,
+    соседние страницы запрашиваются по ключу (timestamp, id), а не через OFFSET.
+    """
     keyboard = InlineKeyboardBuilder()
     if status:
-        callback_base = f"page:{status}:"
+        callback_base = f"page:{status_key(status)}:"
     else:
         callback_base = "page:all:"
     
@@ -20,16 +55,137 @@ def build_pagination_keyboard(current_page, total_pages, status=None):
         return keyboard.as_markup()
     
     if current_page > 1:
-        keyboard.button(text="<", callback_data=f"{callback_base}{current_page - 1}")
+        if first_cursor and current_page > 2:
+            keyboard.button(text="<", callback_data=f"{callback_base}{current_page - 1}:<{first_cursor}")
+        else:
+            keyboard.button(text="<", callback_data=f"{callback_base}{current_page - 1}")
     if current_page < total_pages:
-        keyboard.button(text=">", callback_data=f"{callback_base}{current_page + 1}")
+        if last_cursor:
+            keyboard.button(text=">", callback_data=f"{callback_base}{current_page + 1}:>{last_cursor}")
+        else:
+            keyboard.button(text=">", callback_data=f"{callback_base}{current_page + 1}")
     if status:
-        keyboard.button(text="Найти", callback_data=f"search:{status}")
+        keyboard.button(text="Найти", callback_data=f"search:{status_key(status)}")
     else:
         keyboard.button(text="Найти", callback_data="search:all")
     
     return keyboard.as_markup()
 
+NUMBER_SEPARATORS = re.compile(r"[\r\n,;]+")
+NUMBER_NOISE = re.compile(r"[\s()\-.]")
+RANGE_SEPARATOR = re.compile(r"\s*\.\.\s*")
+
+def normalize_number(raw):
+    """
+    Приводит номер к виду [+]цифры. Возвращает None, если это не номер.
+    """
+    number = NUMBER_NOISE.sub("", raw)
+    digits = number[1:] if number.startswith("+") else number
+    if not digits.isdigit() or not 5 <= len(digits) <= 15:
+        return None
+    return number
+
+def parse_range(entry):
+    """
+    Концы диапазона "начало..конец" в нормализованном виде или None,
+    если это не диапазон двух номеров.
+    """
+    if ".." not in entry:
+        return None
+    start, _, end = entry.partition("..")
+    start, end = normalize_number(start), normalize_number(end)
+    if start is None or end is None:
+        return None
+    return start, end
+
+def split_number_entries(text):
+    """
+    Делит текст на записи номеров. Записи разделяются переводами строки,
+    запятыми и точками с запятой; пробелы внутри записи считаются
+    оформлением номера ("+7 (999) 123-45-67"). Если запись целиком
+    не является номером или диапазоном номеров, она делится по пробелам
+    ("79990000001 79990000002").
+    """
+    entries = []
+    for entry in NUMBER_SEPARATORS.split(text):
+        entry = RANGE_SEPARATOR.sub("..", entry.strip().strip('"\''))
+        if not entry:
+            continue
+        if normalize_number(entry) is None and parse_range(entry) is None and len(entry.split()) > 1:
+            entries.extend(entry.split())
+        else:
+            entries.append(entry)
+    return entries
+
+def parse_numbers(text):
+    """
+    Разбирает текст или CSV со списком номеров.
+    Возвращает (уникальные номера в порядке появления, число повторов, число невалидных).
+    """
+    numbers = {}
+    duplicates = 0
+    invalid = 0
+    for token in split_number_entries(text):
+        number = normalize_number(token)
+        if number is None:
+            invalid += 1
+        elif number in numbers:
+            duplicates += 1
+        else:
+            numbers[number] = None
+    return list(numbers), duplicates, invalid
+
+MAX_RANGE_SIZE = 1000
+
+def parse_number_list(text):
+    """
+    Разбирает список номеров для массовых команд.
+    Поддерживает диапазоны вида 79990000001..79990000010 и +79990000001..+79990000010.
+    Концы диапазона нормализуются как отдельные номера и должны быть одной длины,
+    поэтому все номера диапазона тоже проходят проверку формата.
+    Возвращает (уникальные номера в порядке появления, невалидные элементы).
+    """
+    numbers = {}
+    invalid = []
+    for token in split_number_entries(text):
+        if ".." in token:
+            bounds = parse_range(token)
+            if bounds is None:
+                invalid.append(token)
+                continue
+            start, end = bounds
+            prefix = "+" if start.startswith("+") else ""
+            first, last = start.lstrip("+"), end.lstrip("+")
+            if (end.startswith("+") != bool(prefix) or len(first) != len(last)
+                    or not 0 <= int(last) - int(first) < MAX_RANGE_SIZE):
+                invalid.append(token)
+                continue
+            for value in range(int(first), int(last) + 1):
+                numbers[prefix + str(value).zfill(len(first))] = None
+        else:
+            number = normalize_number(token)
+            if number is None:
+                invalid.append(token)
+            else:
+                numbers[number] = None
+    return list(numbers), invalid
+
+def format_bulk_result(action, numbers, changed, invalid=()):
+    """
+    Сводный ответ массовой команды.
+    """
+    changed = set(changed)
+    missing = [number for number in numbers if number not in changed]
+    lines = [f"{action}: {len(changed)} из {len(numbers)}"]
+    if missing:
+        shown = ", ".join(missing[:20])
+        if len(missing) > 20:
+            shown += f" и еще {len(missing) - 20}"
+        lines.append(f"Не найдены: {shown}")
+    if invalid:
+        lines.append(f"Неверный формат: {', '.join(invalid)}")
+    return "\n".join(lines)
+
 def format_hold_duration(hold_duration):
     if hold_duration is None:
         return ""
@@ -47,8 +203,8 @@ def format_list(records, title, current_page, total_pages):
     
     header = f"<b>{title} (стр. {current_page}/{total_pages}):</b>\n"
     body = "\n".join([
-        f"{i+1}. {record['user_tag']} {record['number']} - {record['status']} [{'{:.0f}d {:.0f}h {:.0f}m'.format(record['elapsed_time'].days, record['elapsed_time'].seconds // 3600, (record['elapsed_time'].seconds % 3600) // 60)}]" if record['elapsed_time'] else
-        f"{i+1}. {record['user_tag']} {record['number']} - {record['status']} [0d 0h 0m]"
+        f"{i+1}. {record['user_tag']} {record['number']} - {Status(record['status']).label} [{'{:.0f}d {:.0f}h {:.0f}m'.format(record['elapsed_time'].days, record['elapsed_time'].seconds // 3600, (record['elapsed_time'].seconds % 3600) // 60)}]" if record['elapsed_time'] else
+        f"{i+1}. {record['user_tag']} {record['number']} - {Status(record['status']).label} [0d 0h 0m]"
         for i, record in enumerate(records)
     ])
     return header + body
@@ -3,14 +3,22 @@ from aiogram import Bot, Dispatcher
 from bot.handlers import setup_handlers
 from bot.database import init_db, delete_expired_records
 from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 from redis.asyncio import Redis
 import os
 from dotenv import load_dotenv
 import logging
 from bot.database import (
-    mark_as_successful, get_pool
+    expire_holds, notify_successful_holds, get_hold_deadlines
 )
-from datetime import datetime, timezone, timedelta
+from bot.scheduler import hold_scheduler
+from bot.user_cache import user_cache
+from bot.admin_cache import admin_cache
+from bot.leader import LeaderElection
+from bot.outbox import outbox
+from bot.metrics import start_metrics_server, task_duration, task_errors
+from bot.middlewares import TelegramMetricsMiddleware
 
 load_dotenv()
 
@@ -20,62 +28,106 @@ logger = logging.getLogger(__name__)
 TOKEN = os.getenv("BOT_TOKEN")
 REDIS_URL = f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}"
 
+# polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", 8080))
+
 if not TOKEN:
     raise ValueError("Set your bot token in .env!")
 
 redis = Redis.from_url(REDIS_URL)
 storage = RedisStorage(redis)
 bot = Bot(token=TOKEN)
+bot.session.middleware(TelegramMetricsMiddleware())
 dp = Dispatcher(storage=storage)
 
 async def periodic_cleanup():
     while True:
         try:
             from bot.database import delete_expired_records  # Импортируем функцию из database.py
-            await delete_expired_records()
+            with task_duration.time("periodic_cleanup"):
+                await delete_expired_records()
             logger.info("Cleanup of expired records completed.")
         except Exception as e:
+            task_errors.inc("periodic_cleanup")
             logger.error(f"Database cleanup error: {e}")
         await asyncio.sleep(3600)
 
+async def complete_holds(now):
+    try:
+        with task_duration.time("check_holds"):
+            records = await expire_holds(now)
+            if records:
+                logger.info(f"{len(records)} holds completed.")
+                await notify_successful_holds(records, bot)
+    except Exception:
+        task_errors.inc("check_holds")
+        raise
+
 async def check_holds():
+    # Восстанавливаем расписание из базы и спим до ближайшего дедлайна
     while True:
         try:
-            hold_duration_str = await redis.get("global_hold_duration")
-            if hold_duration_str:
-                hold_duration = int(hold_duration_str)
-            else:
-                hold_duration = None
-            now = datetime.now(timezone.utc)
-            pool = await get_pool()
-            async with pool.acquire() as conn:
-                if hold_duration:
-                    records = await conn.fetch("""
-                        SELECT id, number, hold_set_by, chat_id
-                        FROM numbers
-                        WHERE status = '🟠 Холдинг'
-                        AND hold_start + hold_duration <= $1
-                    """, now)
-                else:
-                    records = await conn.fetch("""
-                        SELECT id, number, hold_set_by, chat_id
-                        FROM numbers
-                        WHERE status = '🟠 Холдинг'
-                        AND hold_start IS NOT NULL
-                    """)
-                for record in records:
-                    await mark_as_successful(record['number'], record['chat_id'], bot)
+            await hold_scheduler.run_leader(get_hold_deadlines, complete_holds)
         except Exception as e:
-            logger.error(f"Error checking holds: {e}")
-        await asyncio.sleep(60)  # Check every minute
+            logger.error(f"Hold scheduler error: {e}")
+            await asyncio.sleep(5)
+
+async def relay_notices():
+    # Уведомления со всех реплик отправляет лидер: лимиты Telegram общие для бота
+    await outbox.relay(bot)
+
+async def run_webhook():
+    """
+    Принимает апдейты через вебхук. Несколько реплик могут работать за балансировщиком.
+    """
+    if not WEBHOOK_URL:
+        raise ValueError("Set WEBHOOK_URL in .env to run in webhook mode!")
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    await bot.set_webhook(
+        f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types()
+    )
+    logger.info(f"Webhook server listening on {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
 
 async def main():
     await init_db()
-    asyncio.create_task(periodic_cleanup())
-    asyncio.create_task(check_holds())
+    await start_metrics_server()
+    # Плановые задачи выполняет только одна реплика — текущий лидер
+    hold_scheduler.redis = redis
+    outbox.redis = redis
+    leader = LeaderElection(redis)
+    leader_task = asyncio.create_task(leader.run([periodic_cleanup, check_holds, relay_notices]))
+    asyncio.create_task(user_cache.run())
     setup_handlers(dp, redis)
-    logger.info("Bot started!")
-    await dp.start_polling(bot)
+    asyncio.create_task(admin_cache.listen())
+    logger.info(f"Bot started in {BOT_MODE} mode!")
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            # Вебхук, оставшийся от запуска в режиме webhook, мешает getUpdates
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        # Снимает аренду лидера: задачи сразу подхватит другая реплика
+        leader_task.cancel()
+        await asyncio.gather(leader_task, return_exceptions=True)
 
 if __name__ == "__main__":
     import asyncio
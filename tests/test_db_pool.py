@@ -0,0 +1,62 @@
+import asyncio
+from bot import db_pool
+from bot.db_pool import InstrumentedPool, session_scope
+
+class FakeRawPool:
+    def __init__(self):
+        self.acquired = 0
+        self.released = []
+
+    async def acquire(self, timeout=None):
+        self.acquired += 1
+        return f"conn{self.acquired}"
+
+    async def release(self, conn):
+        self.released.append(conn)
+
+def test_consecutive_queries_share_session_connection():
+    async def scenario():
+        pool = InstrumentedPool(FakeRawPool())
+        async with session_scope():
+            async with pool.acquire() as first:
+                pass
+            async with pool.acquire() as second:
+                pass
+        return first, second, pool.raw
+
+    first, second, raw = asyncio.run(scenario())
+    assert first == second == "conn1"
+    assert raw.released == ["conn1"]
+
+def test_idle_session_connection_returns_to_pool(monkeypatch):
+    monkeypatch.setattr(db_pool, "DB_SESSION_IDLE_RELEASE", 0.01)
+
+    async def scenario():
+        pool = InstrumentedPool(FakeRawPool())
+        async with session_scope():
+            async with pool.acquire():
+                pass
+            # Обработчик ждет ответа Telegram
+            await asyncio.sleep(0.05)
+            released_while_idle = list(pool.raw.released)
+            async with pool.acquire() as conn:
+                pass
+        return released_while_idle, conn, pool.raw
+
+    released_while_idle, conn, raw = asyncio.run(scenario())
+    assert released_while_idle == ["conn1"]
+    assert conn == "conn2"
+    assert raw.released == ["conn1", "conn2"]
+
+def test_busy_session_connection_is_not_shared():
+    async def scenario():
+        pool = InstrumentedPool(FakeRawPool())
+        async with session_scope():
+            async with pool.acquire() as outer:
+                async with pool.acquire() as inner:
+                    pass
+        return outer, inner, pool.raw
+
+    outer, inner, raw = asyncio.run(scenario())
+    assert outer != inner
+    assert sorted(raw.released) == ["conn1", "conn2"]
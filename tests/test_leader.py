@@ -0,0 +1,41 @@
+import asyncio
+from bot.leader import LeaderElection
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, identity, *args):
+        if self.data.get(key) != identity:
+            return 0
+        if "del" in script:
+            del self.data[key]
+        return 1
+
+def test_cancelled_leader_releases_lease():
+    async def scenario():
+        redis = FakeRedis()
+        leader = LeaderElection(redis, ttl=30)
+        started = asyncio.Event()
+
+        async def job():
+            started.set()
+            await asyncio.Event().wait()
+
+        task = asyncio.create_task(leader.run([job]))
+        await started.wait()
+        held = redis.data.get(leader.key) == leader.identity
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return held, leader.key in redis.data, leader.is_leader
+
+    held, still_held, is_leader = asyncio.run(scenario())
+    assert held
+    assert not still_held
+    assert not is_leader
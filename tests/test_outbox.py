@@ -0,0 +1,53 @@
+import asyncio
+from bot.outbox import Outbox, OUTBOX_KEY
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    async def blpop(self, key, timeout=0):
+        if self.lists.get(key):
+            return key, self.lists[key].pop(0)
+        await asyncio.sleep(0.01)
+        return None
+
+def test_send_without_redis_queues_locally():
+    async def scenario():
+        outbox = Outbox()
+        delivered = []
+
+        async def deliver(bot, chat_id, text, parse_mode):
+            delivered.append((chat_id, text))
+
+        outbox._deliver = deliver
+        await outbox.send("bot", [(1, "hello", None, None)])
+        await asyncio.sleep(0.01)
+        return delivered
+
+    assert asyncio.run(scenario()) == [(1, "hello")]
+
+def test_messages_from_any_replica_are_sent_by_relay():
+    async def scenario():
+        redis = FakeRedis()
+        replica, leader = Outbox(), Outbox()
+        replica.redis = leader.redis = redis
+        delivered = []
+
+        async def deliver(bot, chat_id, text, parse_mode):
+            delivered.append((bot, chat_id, text, parse_mode))
+
+        replica._deliver = leader._deliver = deliver
+        await replica.send("replica bot", [(1, "hello", "HTML", None)])
+        queued = list(redis.lists[OUTBOX_KEY])
+        relay = asyncio.create_task(leader.relay("leader bot"))
+        await asyncio.sleep(0.05)
+        relay.cancel()
+        await asyncio.gather(relay, return_exceptions=True)
+        return queued, delivered
+
+    queued, delivered = asyncio.run(scenario())
+    assert len(queued) == 1
+    assert delivered == [("leader bot", 1, "hello", "HTML")]
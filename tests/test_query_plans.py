@@ -0,0 +1,35 @@
+import re
+from bot import queries
+from bot.query_plans import hot_queries, plan_scans
+
+def all_queries():
+    values = []
+    for name, value in vars(queries).items():
+        if not name.isupper() or name == "CREATE_INTAKE":
+            continue
+        values += list(value.values()) if isinstance(value, dict) else [value]
+    return values
+
+def test_every_query_is_checked():
+    checked = {query for _, query, _, _ in hot_queries(False) + hot_queries(True)}
+    missing = [" ".join(query.split())[:60] for query in all_queries() if query not in checked]
+    assert missing == []
+
+def test_sample_arguments_match_placeholders():
+    for name, query, args, _ in hot_queries(False) + hot_queries(True):
+        placeholders = max([int(n) for n in re.findall(r"\$(\d+)", query)] or [0])
+        assert placeholders == len(args), name
+
+def test_plan_scans_reads_index_of_bitmap_scan():
+    plan = {
+        "Node Type": "ModifyTable", "Relation Name": "numbers",
+        "Plans": [{
+            "Node Type": "Bitmap Heap Scan", "Relation Name": "numbers",
+            "Plans": [{"Node Type": "Bitmap Index Scan", "Index Name": "idx_hold_end"}],
+        }],
+    }
+    assert plan_scans(plan) == [("Bitmap Index Scan", "idx_hold_end")]
+
+def test_plan_scans_reports_seq_scan():
+    plan = {"Node Type": "Limit", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "numbers"}]}
+    assert plan_scans(plan) == [("Seq Scan", "numbers")]
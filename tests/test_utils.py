@@ -0,0 +1,91 @@
+from bot.status import Status
+from bot.utils import normalize_number, parse_numbers, parse_number_list, build_pagination_keyboard
+
+def test_normalize_number_strips_formatting():
+    assert normalize_number("+7 (999) 123-45-67") == "+79991234567"
+    assert normalize_number("8.999.123.45.67") == "89991234567"
+
+def test_normalize_number_rejects_non_numbers():
+    assert normalize_number("abc") is None
+    assert normalize_number("123") is None
+    assert normalize_number("+") is None
+
+def test_parse_numbers_keeps_formatted_number_whole():
+    assert parse_numbers("+7 (999) 123-45-67") == (["+79991234567"], 0, 0)
+
+def test_parse_numbers_splits_on_newlines_commas_and_semicolons():
+    text = "79990000001\n79990000002,79990000003;\r\n79990000004"
+    assert parse_numbers(text) == (["79990000001", "79990000002", "79990000003", "79990000004"], 0, 0)
+
+def test_parse_numbers_splits_space_separated_list():
+    assert parse_numbers("79990000001 79990000002") == (["79990000001", "79990000002"], 0, 0)
+
+def test_parse_numbers_counts_duplicates_after_normalization():
+    assert parse_numbers("+7 999 123 45 67\n+7(999)1234567") == (["+79991234567"], 1, 0)
+
+def test_parse_numbers_counts_invalid_entries():
+    assert parse_numbers("79990000001, abc, 12") == (["79990000001"], 0, 2)
+
+def test_parse_numbers_csv_with_quotes():
+    assert parse_numbers('"79990000001"\n\'79990000002\'\n') == (["79990000001", "79990000002"], 0, 0)
+
+def test_parse_numbers_empty():
+    assert parse_numbers("") == ([], 0, 0)
+    assert parse_numbers(" \n, ;") == ([], 0, 0)
+
+def test_parse_number_list_single_formatted_number():
+    assert parse_number_list("+7 999 123 45 67") == (["+79991234567"], [])
+
+def test_parse_number_list_trailing_separator():
+    assert parse_number_list("79990000001,") == (["79990000001"], [])
+
+def test_parse_number_list_space_separated():
+    assert parse_number_list("79990000001 79990000002") == (["79990000001", "79990000002"], [])
+
+def test_parse_number_list_range():
+    numbers, invalid = parse_number_list("79990000008..79990000011")
+    assert numbers == ["79990000008", "79990000009", "79990000010", "79990000011"]
+    assert invalid == []
+
+def test_parse_number_list_range_mixed_with_numbers():
+    numbers, invalid = parse_number_list("79990000001..79990000002 79990000005")
+    assert numbers == ["79990000001", "79990000002", "79990000005"]
+    assert invalid == []
+
+def test_parse_number_list_rejects_bad_ranges():
+    assert parse_number_list("1..100000") == ([], ["1..100000"])
+    assert parse_number_list("79990000010..79990000001") == ([], ["79990000010..79990000001"])
+
+def test_parse_number_list_invalid_entries():
+    assert parse_number_list("79990000001, abc") == (["79990000001"], ["abc"])
+
+def test_parse_number_list_range_with_plus():
+    numbers, invalid = parse_number_list("+79990000001..+79990000003")
+    assert numbers == ["+79990000001", "+79990000002", "+79990000003"]
+    assert invalid == []
+
+def test_parse_number_list_range_with_formatted_endpoints():
+    numbers, invalid = parse_number_list("+7 999 000-00-01..+7 999 000-00-02")
+    assert numbers == ["+79990000001", "+79990000002"]
+    assert invalid == []
+
+def test_parse_number_list_range_with_spaces_around_separator():
+    numbers, invalid = parse_number_list("79990000001 .. 79990000003")
+    assert numbers == ["79990000001", "79990000002", "79990000003"]
+    assert invalid == []
+
+def test_parse_number_list_rejects_ranges_of_short_numbers():
+    assert parse_number_list("1..5") == ([], ["1..5"])
+
+def test_parse_number_list_rejects_mixed_plus_range():
+    assert parse_number_list("+79990000001..79990000003") == ([], ["+79990000001..79990000003"])
+
+def test_pagination_keyboard_uses_numeric_status_code():
+    keyboard = build_pagination_keyboard(1, 2, status=Status.HOLD, last_cursor="abc")
+    callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+    assert callbacks == ["page:2:2:>abc", "search:2"]
+
+def test_pagination_keyboard_all_list():
+    keyboard = build_pagination_keyboard(1, 2, status="all")
+    callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+    assert callbacks == ["page:all:2", "search:all"]